@@ -1,14 +1,20 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+from log_time import utc_datetime64, local_datetime64
+from table_access_time import read_cycle_table, cycle_times
+
 def plot_access_granted_timeline(transitions_csv, png_out):
-    # Load CSV
-    df = pd.read_csv(transitions_csv)
+    # Load CSV (or take the cycle table DataFrame as it is)
+    df = read_cycle_table(transitions_csv)
 
-    # Parse all relevant columns as datetime
-    for col in ['OPEN to REQUESTED', 'REQUESTED to CLOSED', 'CLOSED to PREPARING', 'PREPARING to SAFE_ACCESS_GRANTED']:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
+    # Parse all relevant columns as UTC datetimes; the request time is also kept in local time for labels
+    times = cycle_times(df, ['OPEN to REQUESTED', 'REQUESTED to CLOSED', 'CLOSED to PREPARING', 'PREPARING to SAFE_ACCESS_GRANTED'])
+    df = df[['Location']].copy()
+    for col, (ns, offset) in times.items():
+        df[col] = utc_datetime64(ns)
+        if col == 'OPEN to REQUESTED':
+            df['Request Local'] = local_datetime64(ns, offset)
 
     # Drop rows with any NaN in required transitions
     required_cols = ['OPEN to REQUESTED', 'REQUESTED to CLOSED', 'CLOSED to PREPARING', 'PREPARING to SAFE_ACCESS_GRANTED']
@@ -34,7 +40,7 @@ def plot_access_granted_timeline(transitions_csv, png_out):
     plt.xlim([0, 1200])  # Limit x-axis to 1200 sec
 
     # Label y-axis as location and request time
-    labels = clean_df['Location'] + ' | ' + clean_df['OPEN to REQUESTED'].dt.strftime('%Y-%m-%d %H:%M')
+    labels = clean_df['Location'] + ' | ' + clean_df['Request Local'].dt.strftime('%Y-%m-%d %H:%M')
     plt.yticks(y_pos, labels)
     plt.xlabel('Seconds')
     plt.title('Time to Safe Access Granted (Stacked per Transition)')
@@ -6,14 +6,26 @@
 # 2025-07-09T03:56:54.083-04:00 botguardian2 <info> mast  39653 #6013 _siomon_  Z1 aisle key    1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 1111111111 111
 
 # Step 1: Filter raw log to only relevant Z1-Z3 aisle req/key entries
+# (steps 1-3 also run as one pass without intermediate files: python snapshot_pipeline.py scpu-20250710.log)
 
-import csv
-import re
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sasAccessTimeDataExtraction import extract_and_filter_logs
 
 # log_file = 'scpu.log'
+# .gz/.xz archives are read directly, no need to unzip them first
 log_file = 'scpu-20250710.log'
 filtered_output = 'intermediate_filtered_log.csv'
 
+# Optional time window, e.g. '2025-07-10T14:00:00-04:00'; only that part of the log is read
+since = None
+until = None
+
+# 'mmap' scans raw bytes and decodes only matching lines; 'lines' decodes every line
+backend = 'mmap'
+
 include_keywords = [
     "Z1 aisle req", "Z1 aisle key",
     "Z1 dwy req", "Z1 dwy door", "Z1 dwy state",
@@ -36,21 +48,10 @@ exclude_phrases = [
     "Unsafe cell"
 ]
 
-include_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in include_keywords) + r')\b', re.IGNORECASE)
-exclude_pattern = re.compile(r'|'.join(re.escape(p) for p in exclude_phrases), re.IGNORECASE)
-
-filtered_lines = []
-with open(log_file, 'r') as f:
-    for line in f:
-        line_lower = line.lower()
-        if include_pattern.search(line) and not exclude_pattern.search(line_lower):
-            # Clean the hostname: botguardianX.mservices.xxx06020-c.sxxxxxxx → botguardianX
-            cleaned_line = re.sub(r'(\bbotguardian\d+)\.mservices\.[^\s]+', r'\1', line.strip())
-            filtered_lines.append([cleaned_line])
-
-with open(filtered_output, 'w', newline='') as f:
-    writer = csv.writer(f)
-    writer.writerow(['Log Entry'])
-    writer.writerows(filtered_lines)
+# A multi-GB day file is split into newline-aligned chunks filtered in parallel;
+# line order is preserved. The hostname is cleaned: botguardianX.mservices.xxx06020-c.sxxxxxxx → botguardianX
+extract_and_filter_logs([log_file], output_csv=filtered_output, workers=os.cpu_count(),
+                        include_keywords=include_keywords, exclude_phrases=exclude_phrases,
+                        since=since, until=until, backend=backend)
 
 print(f"Filtered entries written to {filtered_output}")
@@ -1,7 +1,12 @@
 # Transition detector with 3-part dwy (req, door, state)
 
 import csv
+import os
 import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from log_reader import open_log
 
 filtered_input = 'intermediate_filtered_log.csv'
 final_output = 'filtered_log_transitions.csv'
@@ -26,7 +31,7 @@ capture_next_state = {label: False for label, _, _, state in zone_types if state
 
 filtered_lines = []
 
-with open(filtered_input, 'r') as f:
+with open_log(filtered_input, 'rt', newline='') as f:
     reader = csv.reader(f)
     next(reader)  # Skip header
 
@@ -0,0 +1,136 @@
+import csv
+from itertools import islice
+
+from log_reader import open_log
+from log_time import parse_timestamps
+from reshape_list_to_table import parse_transition, cycle_start_transition, TRANSITIONS_OF_INTEREST
+
+# Lines parsed per batch by stream_cycle_table; bounds memory whatever the size of the log
+BATCH_LINES = 100000
+
+# A cycle's deltas are final once access is granted, so follow mode emits it right then
+GRANTED_TRANSITIONS = ("PREPARING to SAFE_ACCESS_GRANTED", "CLOSED_EMPTY to ACCESS_GRANTED_EMPTY")
+
+
+class CycleEngine:
+    """
+    Streaming counterpart of build_cycle_table. Events are fed one at a time, in time order per
+    location, and a location's cycle is returned as a finished parsed_transitions row
+    (Location, Cycle Start and the first time of each transition of interest) when its next
+    cycle start arrives; finish() returns the cycles still open at the end.
+    Only one open cycle per location is kept, so memory grows with the number of locations.
+
+    Windows match build_cycle_table: a cycle runs from its start up to, not including, the
+    next start's timestamp. An event earlier than its location's latest event is still placed
+    by time within the open cycle; one earlier than the open cycle's start cannot be placed
+    any more and is counted in late_events.
+    """
+
+    def __init__(self):
+        self.open_cycles = {}
+        self.latest = {}  # location -> (latest timestamp, events seen at that timestamp)
+        self.late_events = 0
+
+    def add(self, timestamp, location, transition, value=None):
+        """
+        Feeds one transition. timestamp orders events (e.g. UTC epoch ns), value is what the
+        row stores for it (defaults to timestamp). Returns the rows finished by it (usually none).
+        """
+        if value is None:
+            value = timestamp
+        finished = []
+        latest_time, tied = self.latest.get(location, (None, None))
+        if latest_time is None or timestamp > latest_time:
+            latest_time, tied = timestamp, []
+            self.latest[location] = (latest_time, tied)
+        cycle = self.open_cycles.get(location)
+        if cycle is not None and timestamp < cycle['start']:
+            self.late_events += 1
+            return finished
+
+        if transition == cycle_start_transition(location):
+            new_cycle = {'start': timestamp, 'times': {}, 'row': {'Location': location, 'Cycle Start': value},
+                         'emitted': False}
+            if cycle is not None:
+                for t, t_time in list(cycle['times'].items()):
+                    if t_time >= timestamp:
+                        new_cycle['times'][t] = cycle['times'].pop(t)
+                        new_cycle['row'][t] = cycle['row'].pop(t)
+                finished += self.close(cycle)
+            self.open_cycles[location] = cycle = new_cycle
+            # events logged at the same time as a cycle start belong to that cycle
+            if timestamp == latest_time:
+                for t, v in tied:
+                    self.record(cycle, timestamp, t, v)
+
+        if timestamp == latest_time:
+            tied.append((transition, value))
+        if cycle is not None:
+            self.record(cycle, timestamp, transition, value)
+        return finished
+
+    def record(self, cycle, timestamp, transition, value):
+        """Keeps the first time of each transition of interest."""
+        if transition in TRANSITIONS_OF_INTEREST and (transition not in cycle['times']
+                                                      or timestamp < cycle['times'][transition]):
+            cycle['times'][transition] = timestamp
+            cycle['row'][transition] = value
+
+    def close(self, cycle):
+        """Rows to emit for a cycle that has ended."""
+        return [cycle['row']]
+
+    def finish(self):
+        """Ends every open cycle; returns their rows."""
+        finished = []
+        for cycle in self.open_cycles.values():
+            finished += self.close(cycle)
+        self.open_cycles = {}
+        self.latest = {}
+        return finished
+
+
+class AccessCycleTracker(CycleEngine):
+    """
+    CycleEngine for follow mode: a cycle is emitted as soon as access is granted, and a cycle
+    that is never granted when the location's next cycle starts.
+    """
+
+    def add(self, timestamp, location, transition, value=None):
+        completed = super().add(timestamp, location, transition, value)
+        cycle = self.open_cycles.get(location)
+        if cycle is not None and not cycle['emitted'] and transition in cycle['times'] \
+                and transition in GRANTED_TRANSITIONS:
+            cycle['emitted'] = True
+            completed.append(cycle['row'])
+        return completed
+
+    def close(self, cycle):
+        return [] if cycle['emitted'] else [cycle['row']]
+
+
+def stream_cycle_table(filtered_csv, output_csv='parsed_transitions.csv'):
+    """
+    reshape_log_to_table through CycleEngine: the filtered log is read in batches and each
+    cycle is written as soon as it ends, so neither the log nor a DataFrame is held in memory.
+    Cells hold the timestamps as logged. Rows come out in the order cycles end rather than
+    grouped by location, and the log is expected in time order per location (as extracted
+    from one day's log); reshape_log_to_table sorts instead.
+    """
+    engine = CycleEngine()
+    columns = ['Location', 'Cycle Start'] + [t for t in TRANSITIONS_OF_INTEREST]
+    with open_log(filtered_csv, 'rt') as f, open(output_csv, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=columns)
+        writer.writeheader()
+        while True:
+            lines = list(islice(f, BATCH_LINES))
+            if not lines:
+                break
+            parsed = [p for p in map(parse_transition, lines) if p]
+            timestamps, _ = parse_timestamps([timestamp for timestamp, _, _ in parsed])
+            for (timestamp, location, transition), t in zip(parsed, timestamps):
+                writer.writerows(engine.add(t, location, transition, timestamp))
+        writer.writerows(engine.finish())
+    if engine.late_events:
+        print(f"{engine.late_events} out-of-order transitions in {filtered_csv} were earlier than their cycle and skipped")
+    return output_csv
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+from log_reader import open_log, is_compressed
+
+# Bytes at the start of a log that identify it, so a rotated file is recognised under its new name
+FINGERPRINT_BYTES = 4096
+
+
+def manifest_path(output_csv):
+    return output_csv + '.manifest.json'
+
+
+def file_fingerprint(log_file, length=FINGERPRINT_BYTES):
+    """SHA-1 of the first length bytes of the (decompressed) log, and how many bytes it covers."""
+    with open_log(log_file) as f:
+        head = f.read(length)
+    return hashlib.sha1(head).hexdigest(), len(head)
+
+
+def load_manifest(output_csv, include_keywords, exclude_phrases, code=None):
+    """
+    Returns the manifest of a previous run writing output_csv, or None if there is none
+    or it was made with other keywords or another version (code) of the filtering code
+    (the output then has to be rebuilt from scratch).
+    """
+    if not os.path.exists(output_csv):
+        return None
+    try:
+        with open(manifest_path(output_csv)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get('include_keywords') != list(include_keywords)
+            or manifest.get('exclude_phrases') != list(exclude_phrases)
+            or manifest.get('code') != code):
+        return None
+    return manifest
+
+
+def save_manifest(output_csv, manifest):
+    tmp_path = manifest_path(output_csv) + '.part'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path(output_csv))
+
+
+def resume_offset(log_file, files):
+    """
+    Where to pick up filtering log_file, given the manifest's file entries.
+    Returns (offset, unchanged): unchanged is True when size and mtime match the last run.
+    A file whose head still matches its own entry resumes at that entry's offset; one whose
+    head matches another path's entry (scpu.log rotated to scpu-YYYYMMDD.log, or later
+    compressed) resumes where that path left off. Another path's entry is matched on a full
+    FINGERPRINT_BYTES head, or on the whole file when it was shorter and read to its end.
+    Anything else starts from 0.
+    """
+    st = os.stat(log_file)
+    entry = files.get(log_file)
+    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+        return entry['offset'], True
+
+    candidates = []
+    if entry and entry['fingerprint_len'] > 0:
+        candidates.append(entry)
+    candidates += [e for path, e in files.items()
+                   if path != log_file and (e['fingerprint_len'] == FINGERPRINT_BYTES
+                                            or 0 < e['fingerprint_len'] == e['offset'])]
+    fingerprints = {}
+    for e in candidates:
+        length = e['fingerprint_len']
+        if length not in fingerprints:
+            fingerprints[length] = file_fingerprint(log_file, length)
+        fingerprint, head_len = fingerprints[length]
+        if head_len == length and fingerprint == e['fingerprint']:
+            if not is_compressed(log_file) and st.st_size < e['offset']:
+                break  # truncated in place
+            return e['offset'], False
+    return 0, False
+
+
+def consumable_end(log_file):
+    """End of the last complete line of a plain log; a line still being written is left for the next run."""
+    size = os.path.getsize(log_file)
+    with open(log_file, 'rb') as f:
+        pos = size
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                return pos - step + newline + 1
+            pos -= step
+    return 0
+
+
+def file_entry(log_file, offset):
+    st = os.stat(log_file)
+    fingerprint, length = file_fingerprint(log_file)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'fingerprint': fingerprint, 'fingerprint_len': length, 'offset': offset}
@@ -0,0 +1,114 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+from sasAccessTimeDataExtraction import INCLUDE_KEYWORDS, EXCLUDE_PHRASES
+from log_filter import get_matcher
+from log_time import parse_timestamp, to_datetime
+from reshape_list_to_table import parse_transition
+from access_cycles import AccessCycleTracker
+from table_access_time import transition_delta_row
+
+# Seconds to wait at end of file before polling again
+POLL_INTERVAL = 0.2
+READ_SIZE = 64 * 1024
+
+
+def follow_lines(log_file, from_start=False, poll_interval=POLL_INTERVAL):
+    """
+    Yields each complete line appended to log_file, like tail -F.
+    When the file is rotated (renamed away and recreated) the old file is drained and the
+    new one is read from the top; a truncated file is re-read from the start.
+    """
+    f = None
+    inode = None
+    partial = b''
+    while True:
+        if f is None:
+            try:
+                f = open(log_file, 'rb')
+            except FileNotFoundError:
+                time.sleep(poll_interval)
+                continue
+            inode = os.fstat(f.fileno()).st_ino
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True  # a file appearing after rotation is new, read all of it
+
+        chunk = f.read(READ_SIZE)
+        if chunk:
+            lines = (partial + chunk).split(b'\n')
+            partial = lines.pop()
+            for line in lines:
+                yield line.decode('utf-8', errors='ignore')
+            continue
+
+        try:
+            st = os.stat(log_file)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != inode:
+            if partial:
+                yield partial.decode('utf-8', errors='ignore')
+                partial = b''
+            f.close()
+            f = None
+        elif st.st_size < f.tell():
+            f.seek(0)
+            partial = b''
+        else:
+            time.sleep(poll_interval)
+
+
+def follow_access_cycles(log_file, output_csv=None, from_start=False):
+    """
+    Watches a live scpu.log and writes one transition-delta row per access cycle
+    (same columns as compute_transition_deltas) as soon as access is granted.
+    Cycles that are never granted are written when the location's next cycle starts.
+    Lines are taken in arrival order; a transition logged late is still placed by its timestamp
+    within its cycle (see CycleEngine).
+    """
+    matcher = get_matcher(tuple(INCLUDE_KEYWORDS), tuple(EXCLUDE_PHRASES))
+    tracker = AccessCycleTracker()
+    columns = list(transition_delta_row({'Location': '', 'Cycle Start': None}).keys())
+
+    if output_csv:
+        new_file = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+        out = open(output_csv, 'a', newline='', encoding='utf-8')
+    else:
+        new_file = True
+        out = sys.stdout
+    writer = csv.DictWriter(out, fieldnames=columns)
+    if new_file:
+        writer.writeheader()
+        out.flush()
+
+    try:
+        for line in follow_lines(log_file, from_start):
+            if not matcher.match(line):
+                continue
+            parsed = parse_transition(line)
+            if not parsed:
+                continue
+            timestamp, location, transition = parsed
+            ns, offset = parse_timestamp(timestamp)
+            for row in tracker.add(ns, location, transition, to_datetime(ns, offset)):
+                writer.writerow(transition_delta_row(row))
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Follow scpu.log and emit access-cycle latencies live.")
+    arg_parser.add_argument('log_file', nargs='?', default=os.path.join('raw logs', 'scpu.log'))
+    arg_parser.add_argument('--output', help="append rows to this CSV instead of stdout")
+    arg_parser.add_argument('--from-start', action='store_true', help="replay the existing log before following")
+    args = arg_parser.parse_args()
+    try:
+        follow_access_cycles(args.log_file, args.output, args.from_start)
+    except KeyboardInterrupt:
+        pass
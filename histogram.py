@@ -5,7 +5,8 @@ import warnings
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
 def plot_histograms(delta_csv, png_out):
-    df = pd.read_csv(delta_csv)
+    # delta_csv may also be the transition_deltas DataFrame itself
+    df = delta_csv if isinstance(delta_csv, pd.DataFrame) else pd.read_csv(delta_csv)
     delta_cols = [col for col in df.columns if '(s)' in col]
 
     # Identify rows by type
@@ -53,8 +53,20 @@ import time
 import sys
 import datetime
 from operator import itemgetter, attrgetter
+from itertools import groupby
 import gzip
 import lzma
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+try:
+    # optional: sidecar time index (log_index.py) when run from the sas-access-metrics tree
+    import log_index
+except ImportError:
+    log_index = None
+try:
+    # optional: numpy, for the typed sto table (--table)
+    import numpy
+except ImportError:
+    numpy = None
 
 # defines
 SPACE                       =   " "
@@ -79,6 +91,57 @@ STO_REASON_BYPASS_STR       =   "BYPASSED (Key/door breached)."
 STO_REASON_GATE_CLOSE_STR   =   "bot did not localize after gate closure."
 STO_REASON_UNKNOWN_STR      =   "Unknown."
 
+# sto line patterns - each one selects the lines of one report builder
+STO_PATTERN_UNSAFE_LEVEL        =   "Unsafe level"
+STO_PATTERN_UNSAFE_AISLE        =   "Unsafe zone"
+STO_PATTERN_UNSAFE_DRIVEWAY     =   "Unsafe cell"
+STO_PATTERN_INVALID_AREA        =   "UNSAFE Bot"
+STO_PATTERN_UNLOCALIZED         =   "UNLOCALIZED at level"
+STO_PATTERN_NO_COMM             =   "incommunicado for"
+STO_PATTERNS                    =   (STO_PATTERN_UNSAFE_LEVEL, STO_PATTERN_UNSAFE_AISLE,
+                                     STO_PATTERN_UNSAFE_DRIVEWAY, STO_PATTERN_INVALID_AREA,
+                                     STO_PATTERN_UNLOCALIZED, STO_PATTERN_NO_COMM)
+
+# typed sto table (--table): the rows of the sto_reasons csv as numpy arrays in one .npz file.
+# Times are int64 UTC epoch ns (STO_TABLE_NAT if absent), offsets int16 minutes; the text columns
+# are categoricals, stored as <column>.codes (-1 if empty) and <column>.categories.
+STO_TABLE_NAT               =   -2**63
+# utc_offset of a timestamp logged without one: its sto_time is the site time, stored as if UTC
+STO_TABLE_NO_OFFSET         =   -2**15
+STO_TABLE_CATEGORIES        =   ('access_location', 'structure_access', 'sto_reason')
+# last location / gate closed times, e.g. 07:33:12[21-Mar] (UTC, without the year)
+STO_TABLE_TIME_PATTERN      =   re.compile(r'(\d{2}:\d{2}:\d{2})\[(\d{2}-[a-zA-Z]{3})\]')
+
+# sto line grammar - one precompiled regex per line shape, fields named after the StoRecord fields.
+# Fields are found by their keywords, not by token position, so an extra token elsewhere in the line
+# does not shift them; a line that does not fit its shape is rejected (and counted) instead.
+# (matched a token at a time: as fast as line.split() on the site logs)
+STO_GRAMMAR_HEAD            =   r'(?P<timestamp>\S+)(?:\s+\S+)*?\s+'
+# state=PREPARING  scan@04:38:45 [21-Mar]   gate_closed@08:51:38 [21-Mar]
+STO_GRAMMAR_TIMES           =   r'\s+state=(?P<state>\S+)\s+[^@\s]*@(?P<lastLocTime>\S+)\s+(?P<lastLocYear>\S+)' \
+                                r'\s+(?P<eventType>[^@\s]*)@(?P<eventTime>\S+)\s+(?P<eventYear>\S+)'
+# sto_reason 0x60000(Failed_to_localize) PlcID 3 - optional, anywhere after the fields
+STO_GRAMMAR_TAIL            =   r'(?:(?:\s+(?!sto_reason\b)\S+)*\s+sto_reason\b(?P<stoReason>(?:\s+(?!PlcID\b)\S+)*)' \
+                                r'(?:\s+PlcID(?:\s+(?P<plcId>\S+))?)?)?'
+STO_GRAMMAR = {
+    # Unsafe level 10 bot 10761 : state=... scan@... gate_closed@...
+    STO_PATTERN_UNSAFE_LEVEL:       r'Unsafe level\s+(?P<level>\S+)\s+bot\s+(?P<botid>\S+)\s+:' + STO_GRAMMAR_TIMES,
+    # Unsafe zone 2 aisle 1 bot 8798 : state=... scan@... gate_closed@...
+    STO_PATTERN_UNSAFE_AISLE:       r'Unsafe zone\s+(?P<zone>\S+)\s+aisle\s+(?P<aisle>\S+)\s+bot\s+(?P<botid>\S+)\s+:' \
+                                    + STO_GRAMMAR_TIMES,
+    # Unsafe cell 17 zone 1 driveway 1 bot 10063 : state=... scan@... gate_closed@...
+    STO_PATTERN_UNSAFE_DRIVEWAY:    r'Unsafe cell\s+(?P<cell>\S+)\s+zone\s+(?P<zone>\S+)\s+driveway\s+(?P<driveway>\S+)' \
+                                    r'\s+bot\s+(?P<botid>\S+)\s+:' + STO_GRAMMAR_TIMES,
+    # UNSAFE Bot <botid> ... - the level is the 8th token after the bot id
+    STO_PATTERN_INVALID_AREA:       r'UNSAFE Bot\s+(?P<botid>\S+)(?:\s+\S+){7}\s+(?P<level>\S+)',
+    # <botid> UNLOCALIZED at level 3 closure.
+    STO_PATTERN_UNLOCALIZED:        r'(?P<botid>\S+)\s+UNLOCALIZED at level\s+(?P<level>\S+)\s+(?P<eventType>\S+)',
+    # <botid> [is] incommunicado for 12s
+    STO_PATTERN_NO_COMM:            r'(?P<botid>\S+)\s+(?:is\s+)?incommunicado for\s+(?P<timeNoComm>\S+)',
+}
+STO_GRAMMAR = {pattern: re.compile(STO_GRAMMAR_HEAD + grammar + STO_GRAMMAR_TAIL)
+               for pattern, grammar in STO_GRAMMAR.items()}
+
 """
     StoGetTimeString:
     input: string containing time
@@ -94,22 +157,33 @@ def StoGetTimeString(tstr):
 
 
 """
-	StoMultiSort: helper sort function. Given a list, and a set of keys, it will sort the list 
-					in straight or reverse order and returns the sorted list
+	StoDateTimeSort: helper sort function. Given a list of StoRecord, sort by the epoch time
+					parsed when the record was made (in time order across UTC offset changes)
+"""
+def StoDateTimeSort(iList):
+    return sorted(iList, key = attrgetter('epoch'))
+
+"""
+	StoGroups: helper grouping function. Given a list already sorted on a composite key that
+				starts with the keys fields, yields (key value, entries in time order) for each
+				run of entries with the same keys fields, in a single pass over the list
 """
-def StoMultiSort(iList, keys):
-    for key, reverse in reversed(keys):
-        iList.sort(key = attrgetter(key), reverse = reverse)
-    return iList
+def StoGroups(iList, keys):
+    for key, group in groupby(iList, key = attrgetter(*keys)):
+        yield key, StoDateTimeSort(group)
 
 """
-	StoDateTimeSort: helper sort function. Given a list, sort by dateTime field
-    DateTime format: (YYYY-MM-DDTHH:MN:SS.msec) e.g., 2024-03-21T03:38:32.627 
+	StoFirstPerBot: helper dedup function. Given a group in time order, returns the first
+					entry of each bot (a set lookup per entry, instead of a scan of the bots seen)
 """
-def StoDateTimeSort(iList, start, end):
-    dateFormat = '%Y-%m-%dT%H:%M:%S.%f'
-    iList_t = sorted(iList[start:(end +1)], key = lambda x: datetime.datetime.strptime(x.reportTime, dateFormat))
-    return iList_t
+def StoFirstPerBot(iList):
+    botSet = set()
+    firstList = []
+    for stoLine in iList:
+        if stoLine.botid not in botSet:
+            botSet.add(stoLine.botid)
+            firstList.append(stoLine)
+    return firstList
 
 def StoGetStoReasonStrReduced(stoLine):
     if (stoLine.eventType == STO_EVENT_BYPASSED) or (stoLine.state == STO_EVENT_BYPASSED):
@@ -123,14 +197,40 @@ def StoGetStoReasonStrReduced(stoLine):
         str = stoReason
     return str
 
-def StoParseStoReason(stoLine):
-    idx1 = stoLine.index("sto_reason")
-    if "PlcID" in stoLine:
-        idx2 = stoLine.index("PlcID")
-        stoReason = "_".join(stoLine[idx1+1 : idx2])
-    else:
-        stoReason = "_".join(stoLine[idx1+1 :])
-    return stoReason
+"""
+    StoParseStoReason:
+    input: the sto_reason text of a parsed line (up to PlcID), None if the line has none
+    output: its words joined by '_', e.g. 0x60000(Failed_to_localize)
+"""
+def StoParseStoReason(stoReason):
+    return "_".join((stoReason or '').split())
+
+"""
+    class StoParser: parses the sto lines of each shape with STO_GRAMMAR, a single match per line,
+    and counts the lines matched and rejected per shape
+    parse: the named fields of a line of the given sto line pattern, None if it does not fit
+           or does not start with an ISO timestamp
+    report: one line per sto line pattern seen, e.g. 'Unsafe zone: 120 matched, 1 rejected'
+"""
+class StoParser:
+    def __init__(self):
+        self.matched = dict.fromkeys(STO_PATTERNS, 0)
+        self.rejected = dict.fromkeys(STO_PATTERNS, 0)
+    def parse(self, pattern, line):
+        fields = STO_GRAMMAR[pattern].match(line)
+        if fields is not None:
+            try:
+                datetime.datetime.fromisoformat(fields['timestamp'])
+            except ValueError:
+                fields = None
+        if fields is None:
+            self.rejected[pattern] += 1
+            return None
+        self.matched[pattern] += 1
+        return fields
+    def report(self):
+        return [pattern + ": " + str(self.matched[pattern]) + " matched, " + str(self.rejected[pattern]) + " rejected"
+                for pattern in STO_PATTERNS if self.matched[pattern] or self.rejected[pattern]]
 
 
 def StoGetStoReasonStr(stoLine):
@@ -154,54 +254,59 @@ def StoGetStoReasonStr(stoLine):
     return str
 
 """
-    class AilseAccess: to store the collected log of a bot, which was stoed due to unsafe Aisle 
+    class StoRecord: the collected log of a bot which was stoed, for every report (unsafe aisle,
+    cell, level, invalid area, unlocalized, out of comm). Slotted, so tens of thousands of them
+    stay small; the fields a report does not use are None.
+    timestamp: the log line's time, e.g. 2024-03-21T03:38:32.627-04:00, kept as reportTime
+    (without the UTC offset) for the reports and parsed once into epoch (seconds) for sorting
+    and utcOffset (minutes, None if the time has no offset; epoch then takes it as UTC)
 """
-class AilseAccess:
-    def __init__(self, botid, zone, aisle, state, lastLocTime, lastLocYear, eventType, eventTime, eventYear, reportTime, logStoReason):
-        self.botid = '{0: <5}'.format(botid)
+class StoRecord:
+    __slots__ = ('botid', 'zone', 'aisle', 'cell', 'driveway', 'level', 'state', \
+            'lastLocTime', 'lastLocYear', 'eventType', 'eventTime', 'eventYear', \
+            'timeNoComm', 'reportTime', 'epoch', 'utcOffset', 'stoReason')
+    def __init__(self, timestamp, botid, eventType, logStoReason, zone=None, aisle=None, cell=None, \
+            driveway=None, level=None, state=None, lastLocTime=None, lastLocYear=None, eventTime=None, \
+            eventYear=None, timeNoComm=None):
+        self.botid = botid
         self.zone = zone
         self.aisle = aisle
+        self.cell = cell
+        self.driveway = driveway
+        self.level = level
         self.state = state
         self.lastLocTime = lastLocTime
         self.lastLocYear = lastLocYear
         self.eventType = eventType
         self.eventTime = eventTime
         self.eventYear = eventYear
-        self.reportTime = reportTime
+        self.timeNoComm = timeNoComm
+        self.reportTime = StoGetTimeString(timestamp)
+        stamp = datetime.datetime.fromisoformat(timestamp)
+        offset = stamp.utcoffset()
+        if offset is None:
+            self.utcOffset = None
+            self.epoch = stamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+        else:
+            self.utcOffset = offset // datetime.timedelta(minutes=1)
+            self.epoch = stamp.timestamp()
         self.stoReason = logStoReason
     def __repr__(self):
-        return repr((self.botid, self.zone, self.aisle, self.state, self.lastLocTime, \
-                self.lastLocYear, self.eventType, self.eventTime, \
-                self.eventYear, self.reportTime, self.stoReason))
+        return repr(tuple(getattr(self, name) for name in StoRecord.__slots__ if getattr(self, name) is not None))
 
 #------------------------------------------------------------------------------------------------------
 """
  StoReasonUnsafeAisleReport - generate the report of disabled bots in a unsafe aisle
  input: 
-   sto_list - list of entries of type class AilseAccess
-   {zone, aisle, state} - tuple to search 
-   entry - starting index to the sto_list for search
+   stoListAisle - the entries (StoRecord) of one {zone, aisle, state}, in time order
+   {zone, aisle, state} - the group
    w - file to write
  self.botid, self.aisle, self.state, self.lastLocTime, self.eventType, self.eventTime, self.reportTime
 """
 #------------------------------------------------------------------------------------------------------
-def StoReasonUnsafeAisleReport(stoList, zone, aisle, state, entry, wFile):
-    for lastEntry in range(entry, len(stoList)):
-        if (stoList[lastEntry].zone == zone) and \
-                (stoList[lastEntry].aisle == aisle) and \
-                (stoList[lastEntry].state == state):
-            pass
-        else:
-            break
-    stoListAisle = StoDateTimeSort(stoList, entry, lastEntry)
-    stoReason = ''
-    stoReport = []
-    botList = []
-    for row in range(len(stoListAisle)):
-        if stoListAisle[row].botid not in botList:
-            botList.append(stoListAisle[row].botid)
-            stoReason = StoGetStoReasonStr(stoListAisle[row])
-            stoReport.append(stoReason)
+def StoReasonUnsafeAisleReport(stoListAisle, zone, aisle, state, wFile):
+    botList = StoFirstPerBot(stoListAisle)
+    stoReport = [StoGetStoReasonStr(stoLine) for stoLine in botList]
     
     r1 = "\tNumber of bots disabled-by-safety: " + "{0: <5}".format(len(botList)) + \
             " at Zone: " + "{0: <3}".format(zone)  + " Aisle: " + "{0: <3}".format(aisle) + \
@@ -209,17 +314,15 @@ def StoReasonUnsafeAisleReport(stoList, zone, aisle, state, entry, wFile):
     #print(r1)
     wFile.writelines('\n' + r1 + '\n')
     wFile.writelines(stoReport)
-    # return the starting index to the sto_list for next search
-    return (lastEntry + 1)
 
 #----------------------------------------------------------------------------------------------
 # 2024-03-21T04:58:59.746-04:00 act00006.mservices.wmt06020-c.symbotic <info> work   6204 #3084 _census_  Unsafe zone 2 aisle 1 bot 8798 : state=PREPARING  scan@04:38:45 [21-Mar]   gate_closed@08:51:38 [21-Mar]
 # List = [botid, zone, aisle, state, locStamp, eventType, eventTimeStamp, ReportTime]
 #----------------------------------------------------------------------------------------------
-def StoReasonUnsafeAisle(log):
+def StoReasonUnsafeAisle(log, parser, rows):
     stoUnsafeAisle = []
     stoList = []
-    pattern = r"Unsafe zone"
+    pattern = STO_PATTERN_UNSAFE_AISLE
     #regS = re.compile(pattern)
     try:
         wFile = open(STO_UNSAFE_AISLE, "w+")
@@ -231,92 +334,54 @@ def StoReasonUnsafeAisle(log):
             #if regS.search(line):
             #if line.find(pattern) != -1:
             if pattern in line:
-                elems = line.split()
-                stoUnsafeAisle = AilseAccess(elems[13], \
-                        elems[9], \
-                        elems[11], \
-                        elems[15].split('=')[1], \
-                        elems[16].split('@')[1], \
-                        elems[17], elems[18].split('@')[0], \
-                        elems[18].split('@')[1], \
-                        elems[19], \
-                        StoGetTimeString(elems[0]), \
-                        StoParseStoReason(elems) ) #.rsplit(TIME_RSPLIT_BG, 1)[0]) 
+                fields = parser.parse(pattern, line)
+                if fields is None:
+                    continue
+                stoUnsafeAisle = StoRecord(fields['timestamp'], \
+                        '{0: <5}'.format(fields['botid']), \
+                        fields['eventType'], \
+                        StoParseStoReason(fields['stoReason']), \
+                        zone = fields['zone'], \
+                        aisle = fields['aisle'], \
+                        state = fields['state'], \
+                        lastLocTime = fields['lastLocTime'], \
+                        lastLocYear = fields['lastLocYear'], \
+                        eventTime = fields['eventTime'], \
+                        eventYear = fields['eventYear'])
                 stoList.append(stoUnsafeAisle)
                 stoUnsafeAisle = []
-        stoList = StoMultiSort(list(stoList), (('zone', False), ('aisle', False), ('state', False)))
+        stoList.sort(key = attrgetter('zone', 'aisle', 'state'))
         reportUnsafeAisle = "-----------Disabled-by-safety due to Unsafe Aisle -----------"
         # if len(stoList) > 0:
         #     print(reportUnsafeAisle)
         wFile.writelines(reportUnsafeAisle + '\n')
         
         for entry in stoList:
-            print(f"{entry.reportTime.split('T')[0]},{entry.reportTime.split('T')[1]},{entry.botid},zone:{entry.zone};aisle:{entry.aisle},aisle_access,{entry.stoReason},{entry.lastLocTime}{entry.lastLocYear},{entry.eventTime}{entry.eventYear}")
-
-        entry = 0
-        while entry < len(stoList):
-            zone = stoList[entry].zone
-            aisle = stoList[entry].aisle
-            state = stoList[entry].state
-            entry = StoReasonUnsafeAisleReport(stoList, zone, aisle, state, entry, wFile) 
+            rows.append((entry, f"zone:{entry.zone};aisle:{entry.aisle}", "aisle_access", \
+                    entry.lastLocTime + entry.lastLocYear, entry.eventTime + entry.eventYear))
+
+        for (zone, aisle, state), stoListAisle in StoGroups(stoList, ('zone', 'aisle', 'state')):
+            StoReasonUnsafeAisleReport(stoListAisle, zone, aisle, state, wFile)
         wFile.close()
 
 #----------------------------------------------------------------------------------------------------
 # 2024-03-21T03:38:35.476-04:00 act00006.mservices.wmt06020-c.symbotic <info> work  57476 #3084 _census_  Unsafe cell 17 zone 1 driveway 1 bot 10063 : state=SAFE_ACCESS_GRANTED  scan@06:08:04 [21-Mar]   gate_closed@07:25:22 [21-Mar]
 # List = [botid, cell, zone, driveway, state, locStamp, eventType, eventStamp, reportTime]
 #----------------------------------------------------------------------------------------------------
-"""
-    class DrivewayAccess: to store the collected log of a bot, which was stoed due to unsafe Cell 
-"""
-class DrivewayAccess:
-    def __init__(self, botid, cell, zone, driveway, state, lastLocTime, lastLocYear, eventType, eventTime, eventYear, reportTime, logStoReason):
-        self.botid = '{0: <5}'.format(botid)
-        self.cell = cell
-        self.zone = zone
-        self.driveway = driveway
-        self.state = state
-        self.lastLocTime = lastLocTime
-        self.lastLocYear = lastLocYear
-        self.eventType = eventType
-        self.eventTime = eventTime
-        self.eventYear = eventYear
-        self.reportTime = reportTime
-        self.stoReason = logStoReason
-    def __repr__(self):
-        return repr((self.botid, self.cell, self.zone, self.driveway, self.state, \
-                self.lastLocTime, self.lastLocYear, self.eventType, \
-                self.eventTime, self.eventYear, self.reportTime, self.stoReason))
-
 #------------------------------------------------------------------------------------------------------
 """
  StoReasonUnsafeDrivewayReport - generate the report of disabled bots in a unsafe cell
  input: 
-   sto_list - list of entries of type class AilseAccess
-   {zone, aisle, cell, state} - tuple to search 
-   entry - starting index to the sto_list for search
+   stoListDW - the entries (StoRecord) of one {zone, cell, driveway, state}, in time order
+   {zone, cell, driveway, state} - the group
    w - file to write
    each entry of the input list: self.botid, self.zone, self.aisle, self.cell, self.state, self.lastLocTime, self.eventType, 
 									self.eventTime, self.reportTime
 """
 #------------------------------------------------------------------------------------------------------
-def StoReasonUnsafeDrivewayReport(stoList, zone, cell, driveway, state, entry, w):
-    for lastEntry in range(entry, len(stoList)):
-        if (stoList[lastEntry].zone == zone) and \
-                (stoList[lastEntry].cell == cell) and \
-                (stoList[lastEntry].driveway == driveway) and \
-                (stoList[lastEntry].state == state):
-            pass
-        else:
-            break
-    stoListDW = StoDateTimeSort(stoList, entry, lastEntry)
-    stoReason = ''
-    stoReport = []
-    botList = [] 
-    for row in range(len(stoListDW)):
-        if stoListDW[row].botid not in botList:
-            botList.append(stoListDW[row].botid)
-            stoReason = StoGetStoReasonStr(stoListDW[row])
-            stoReport.append(stoReason)
+def StoReasonUnsafeDrivewayReport(stoListDW, zone, cell, driveway, state, w):
+    botList = StoFirstPerBot(stoListDW)
+    stoReport = [StoGetStoReasonStr(stoLine) for stoLine in botList]
     
     r1 = "\tNumber of bots disabled-by-safety: " + "{0: <5}".format(len(botList)) + \
             " at Zone: " + "{0: <3}".format(zone) + " Cell: " + "{0: <3}".format(cell) + \
@@ -325,13 +390,12 @@ def StoReasonUnsafeDrivewayReport(stoList, zone, cell, driveway, state, entry, w
     #print(r1)
     w.writelines('\n' + r1 + '\n')
     w.writelines(stoReport)
-    return (lastEntry + 1)
 
 
-def StoReasonUnsafeDriveway(log):
+def StoReasonUnsafeDriveway(log, parser, rows):
     stoUnsafeDW = []
     stoList = []
-    pattern = r"Unsafe cell"
+    pattern = STO_PATTERN_UNSAFE_DRIVEWAY
     #regS = re.compile(pattern)
     try:
         wFile = open(STO_UNSAFE_DRIVEWAY, "w+")
@@ -344,88 +408,54 @@ def StoReasonUnsafeDriveway(log):
             #if regS.search(line):
             #if line.find(pattern) != -1:
             if pattern in line:
-                elems = line.split()
-                stoUnsafeDW = DrivewayAccess(elems[15], \
-                        elems[9], \
-                        elems[11], \
-                        elems [13], \
-                        elems[17].split('=')[1], \
-                        elems[18].split('@')[1], \
-                        elems[19], \
-                        elems[20].split('@')[0], \
-                        elems[20].split('@')[1], \
-                        elems[21], \
-                        StoGetTimeString(elems[0]), \
-                        StoParseStoReason(elems) ) #elems[0].rsplit(TIME_RSPLIT_BG, 1)[0])
+                fields = parser.parse(pattern, line)
+                if fields is None:
+                    continue
+                stoUnsafeDW = StoRecord(fields['timestamp'], \
+                        '{0: <5}'.format(fields['botid']), \
+                        fields['eventType'], \
+                        StoParseStoReason(fields['stoReason']), \
+                        cell = fields['cell'], \
+                        zone = fields['zone'], \
+                        driveway = fields['driveway'], \
+                        state = fields['state'], \
+                        lastLocTime = fields['lastLocTime'], \
+                        lastLocYear = fields['lastLocYear'], \
+                        eventTime = fields['eventTime'], \
+                        eventYear = fields['eventYear'])
                 stoList.append(stoUnsafeDW)
                 stoUnsafeDW = []
-        stoList = StoMultiSort(list(stoList), (('zone', False), ('cell', False), ('driveway', False), ('state', False)))
+        stoList.sort(key = attrgetter('zone', 'cell', 'driveway', 'state'))
         reportUnsafeCell = "-----------Disabled-by-safety due to Unsafe Cell ------------"
         # if len(stoList) > 0:
         #     print(reportUnsafeCell)
         wFile.writelines(reportUnsafeCell + '\n')
 
         for entry in stoList:
-            print(f"{entry.reportTime.split('T')[0]},{entry.reportTime.split('T')[1]},{entry.botid},zone:{entry.zone};cell:{entry.cell};driveway:{entry.driveway},driveway_access,{entry.stoReason},{entry.lastLocTime}{entry.lastLocYear},{entry.eventTime}{entry.eventYear}")
-        entry = 0
-        while entry < len(stoList):
-            zone = stoList[entry].zone
-            cell = stoList[entry].cell
-            driveway = stoList[entry].driveway
-            state = stoList[entry].state
-            entry = StoReasonUnsafeDrivewayReport(stoList, zone, cell, driveway, state, entry, wFile)
+            rows.append((entry, f"zone:{entry.zone};cell:{entry.cell};driveway:{entry.driveway}", "driveway_access", \
+                    entry.lastLocTime + entry.lastLocYear, entry.eventTime + entry.eventYear))
+        for (zone, cell, driveway, state), stoListDW in StoGroups(stoList, ('zone', 'cell', 'driveway', 'state')):
+            StoReasonUnsafeDrivewayReport(stoListDW, zone, cell, driveway, state, wFile)
         wFile.close()
 
 #-------------------------------------------------------------------------------------------------
 # 2024-03-21T03:38:32.627-04:00 act00002.mservices.wmt06020-c.symbotic <info> work  16736 #3084 _census_  Unsafe level 10 bot 10761 : state=SAFE_ACCESS_GRANTED  scan@06:34:54 [21-Mar]   gate_closed@07:33:12 [21-Mar]
 # List = [Botid, level, state, locTimeStamp, eventType, eventTimeStamp, reportTime]
 #-------------------------------------------------------------------------------------------------
-"""
-    class LevelAccess: to store the collected log of a bot, which was stoed due to unsafe Level 
-"""
-class LevelAccess:
-    def __init__(self, botid, level, state, lastLocTime, lastLocYear, eventType, eventTime, eventYear, reportTime, logStoReason):
-        self.botid = '{0: <5}'.format(botid)
-        self.level = level
-        self.state = state
-        self.lastLocTime = lastLocTime
-        self.lastLocYear = lastLocYear
-        self.eventType = eventType
-        self.eventTime = eventTime
-        self.eventYear = eventYear
-        self.reportTime = reportTime
-        self.stoReason = logStoReason
-    def __repr__(self):
-        return repr((self.botid, self.level, self.state, self.lastLocTime, self.lastLocYear, \
-                self.eventType, self.eventTime, self.eventYear, self.reportTime, self.stoReason))
-
 #------------------------------------------------------------------------------------------------------
 """
  StoReasonUnsafeLevelReport - generate the report of disabled bots in a unsafe level 
  input: 
-   sto_list - list of entries of type class LevelAccess
-   {level, state} - tuple to search 
-   entry - starting index to the sto_list for search
+   stoListLevel - the entries (StoRecord) of one {level, state}, in time order
+   {level, state} - the group
    w - file to write
    each entry of the input list: self.botid, self.level, self.state, self.lastLocTime, self.eventType, 
 									self.eventTime, self.reportTime
 """
 #------------------------------------------------------------------------------------------------------
-def StoReasonUnsafeLevelReport(stoList, level, state, entry, w):
-    for lastEntry in range(entry, len(stoList)):
-        if (stoList[lastEntry].level == level) and (stoList[lastEntry].state == state):
-            pass
-        else:
-            break
-    stoListLevel = StoDateTimeSort(stoList, entry, lastEntry)
-    stoReason = ''
-    reportList = []
-    botList = []
-    for row in range(len(stoListLevel)):
-        if stoListLevel[row].botid not in botList:
-            botList.append(stoListLevel[row].botid)
-            stoReason = StoGetStoReasonStr(stoListLevel[row])
-            reportList.append(stoReason)
+def StoReasonUnsafeLevelReport(stoListLevel, level, state, w):
+    botList = StoFirstPerBot(stoListLevel)
+    reportList = [StoGetStoReasonStr(stoLine) for stoLine in botList]
 
     r1 = "\tNumber of bots disabled-by-safety: " + "{0: <5}".format(len(botList)) + \
             " at Level: " + "{0: <3}".format(level) + \
@@ -434,13 +464,12 @@ def StoReasonUnsafeLevelReport(stoList, level, state, entry, w):
     #print(r1)
     w.writelines('\n' + r1 + '\n')
     w.writelines(reportList)
-    return (lastEntry + 1)
 
 
-def StoReasonUnsafeLevel(log):
+def StoReasonUnsafeLevel(log, parser, rows):
      stoUnsafeLevel = []
      stoList = []
-     pattern = r"Unsafe level"
+     pattern = STO_PATTERN_UNSAFE_LEVEL
      #regS = re.compile(pattern)
      try:
          wFile = open(STO_UNSAFE_LEVEL, "w+")
@@ -453,32 +482,32 @@ def StoReasonUnsafeLevel(log):
              #if pattern in line:
              #if line.find(pattern) != -1:
              if pattern in line:
-                 elems = line.split()
-                 stoUnsafeLevel = LevelAccess(elems[11], \
-                         elems[9], \
-                         elems[13].split('=')[1], \
-                         elems[14].split('@')[1], \
-                         elems[15], \
-                         elems[16].split('@')[0], \
-                         elems[16].split('@')[1], \
-                         elems[17], \
-                         StoGetTimeString(elems[0]), \
-                         StoParseStoReason(elems)) #elems[0].rsplit(TIME_RSPLIT_BG, 1)[0])
+                 fields = parser.parse(pattern, line)
+                 if fields is None:
+                     continue
+                 stoUnsafeLevel = StoRecord(fields['timestamp'], \
+                         '{0: <5}'.format(fields['botid']), \
+                         fields['eventType'], \
+                         StoParseStoReason(fields['stoReason']), \
+                         level = fields['level'], \
+                         state = fields['state'], \
+                         lastLocTime = fields['lastLocTime'], \
+                         lastLocYear = fields['lastLocYear'], \
+                         eventTime = fields['eventTime'], \
+                         eventYear = fields['eventYear'])
                  stoList.append(stoUnsafeLevel)
                  stoUnsafeLevel = []
-         stoList = StoMultiSort(list(stoList), (('level', False), ('state', False)))
+         stoList.sort(key = attrgetter('level', 'state'))
          reportUnsafeLevel = "-----------Disabled-by-safety due to Unsafe Level -----------"
         #  if len(stoList) > 0:
         #      print(reportUnsafeLevel)
          wFile.writelines(reportUnsafeLevel + '\n')
 
          for entry in stoList:
-            print(f"{entry.reportTime.split('T')[0]},{entry.reportTime.split('T')[1]},{entry.botid},lvl:{entry.level},level_access,{entry.stoReason},{entry.lastLocTime}{entry.lastLocYear},{entry.eventTime}{entry.eventYear}")
-         entry = 0
-         while entry < len(stoList):
-             level = stoList[entry].level
-             state = stoList[entry].state
-             entry = StoReasonUnsafeLevelReport(stoList, level, state, entry, wFile)
+            rows.append((entry, f"lvl:{entry.level}", "level_access", \
+                    entry.lastLocTime + entry.lastLocYear, entry.eventTime + entry.eventYear))
+         for (level, state), stoListLevel in StoGroups(stoList, ('level', 'state')):
+             StoReasonUnsafeLevelReport(stoListLevel, level, state, wFile)
          wFile.close()
 
 #---------------------------------------------------------------------------------------------
@@ -490,44 +519,25 @@ def StoReasonUnsafeLevel(log):
 """
 #---------------------------------------------------------------------------------------------
 # List = [botid, zone, sto_reason, reportTime]
-class InvalidAccessArea:
-    def __init__(self, botid, level, eventType, reportTime, logStoReason):
-        self.botid = botid
-        self.level = level
-        self.eventType = eventType
-        self.reportTime = reportTime
-        self.stoReason = logStoReason
-    def __repr__(self):
-        return repr((self.botid, self.level, self.eventType, self.reportTime, self.stoReason))
-
-def StoReasonInvalidAreaReport(stoList, level, entry, w):
-    for lastEntry in range(entry, len(stoList)):
-        if (stoList[lastEntry].level == level):
-            pass
-        else:
-            break
+def StoReasonInvalidAreaReport(stoListInvalidArea, level, w):
     stoReport = []
-    botList = []
-    stoListInvalidArea = StoDateTimeSort(stoList, entry, lastEntry)
-    for row in range(len(stoListInvalidArea)):
-            if stoListInvalidArea[row].botid not in botList:
-                botList.append(stoListInvalidArea[row].botid)
-                str = "Bot " + stoListInvalidArea[row].botid + " was disabled at " + \
-                        stoListInvalidArea[row].reportTime + " with sto_reason: " + \
-                        stoListInvalidArea[row].eventType + '\n'
-                stoReport.append(str)
+    botList = StoFirstPerBot(stoListInvalidArea)
+    for stoLine in botList:
+        str = "Bot " + stoLine.botid + " was disabled at " + \
+                stoLine.reportTime + " with sto_reason: " + \
+                stoLine.eventType + '\n'
+        stoReport.append(str)
 
     r1 = "\tNumber of bots disabled-by-safety" + "{0: <5}".format(len(botList)) + " at Level: " + "{0: <3}".format(level) + \
             "Total log entries " + "{0: <5}".format(len(stoListInvalidArea))
     #print(r1)
     w.writelines('\n' + r1 + '\n')
     w.writelines(stoReport)
-    return (lastEntry + 1)
 
-def StoReasonInvalidAccessArea(log):
+def StoReasonInvalidAccessArea(log, parser, rows):
      stoInvalidline = []
      stoList = []
-     pattern = r"UNSAFE Bot"
+     pattern = STO_PATTERN_INVALID_AREA
      try:
          wFile = open(STO_INVALID_AREA, "w+")
      except OSError:
@@ -537,26 +547,26 @@ def StoReasonInvalidAccessArea(log):
          for line in log:
              #if line.find(pattern) != -1:
              if pattern in line:
-                 elems = line.split()
-                 stoInvalidLine = InvalidAccessArea(elems[9], \
-                         elems[17], \
+                 fields = parser.parse(pattern, line)
+                 if fields is None:
+                     continue
+                 stoInvalidLine = StoRecord(fields['timestamp'], \
+                         fields['botid'], \
                          "Invalid Codeplate", \
-                         StoGetTimeString(elems[0]), \
-                         StoParseStoReason(elems) ) #elems[0].rsplit(TIME_RSPLIT_BG, 1)[0])
+                         StoParseStoReason(fields['stoReason']), \
+                         level = fields['level'])
                  stoList.append(stoInvalidLine)
                  stoInvalidLine = []
-         stoList = StoMultiSort(list(stoList), (('level', False), ('botid', False)))
+         stoList.sort(key = attrgetter('level', 'botid'))
          reportInvalidArea = "---------------Disabled-by-safety UNSAFE Bots (Bots with Invalid Codeplate)-------------"
         #  if len(stoList) > 0:
         #      print(reportInvalidArea)
          wFile.writelines(reportInvalidArea + '\n')
 
          for entry in stoList:
-            print(f"{entry.reportTime.split('T')[0]},{entry.reportTime.split('T')[1]},{entry.botid},lvl:{entry.level},invalid_access,{entry.stoReason},{entry.lastLocTime}{entry.lastLocYear},{entry.eventTime}{entry.eventYear}")
-         entry = 0
-         while entry < len(stoList):
-             level = stoList[entry].level
-             entry = StoReasonInvalidAreaReport(stoList, level, entry, wFile)
+            rows.append((entry, f"lvl:{entry.level}", "invalid_access", "-", "-"))
+         for (level,), stoListInvalidArea in StoGroups(stoList, ('level',)):
+             StoReasonInvalidAreaReport(stoListInvalidArea, level, wFile)
          wFile.close()
 
 #---------------------------------------------------------------------------------------------
@@ -569,51 +579,31 @@ def StoReasonInvalidAccessArea(log):
     eventType = 'closure' or 'BYPASSED'
 """
 #---------------------------------------------------------------------------------------------
-class UnlocalizedAtLevel:
-    def __init__(self, botid, level, eventType, reportTime, logStoReason):
-        self.botid = '{0: <5}'.format(botid)
-        self.level = level
-        self.eventType = eventType
-        self.reportTime = reportTime
-        self.stoReason = logStoReason
-    def __repr__(self):
-        return repr((self.botid, self.level, self.eventType, self.reportTime, self.stoReason))
-
-def StoReasonUnlocalizedReport(stoList, level, entry, w):
-    for lastEntry in range(entry, len(stoList)):
-        if (stoList[lastEntry].level == level):
-            pass
-        else:
-            break
+def StoReasonUnlocalizedReport(stoListUnlocal, level, w):
     stoReport = []
-    botList = []
-    stoReason = ' '
-    stoListUnlocal = StoDateTimeSort(stoList, entry, lastEntry)
-    for row in range(len(stoListUnlocal)):
-        if stoListUnlocal[row].botid not in botList:
-            botList.append(stoListUnlocal[row].botid)
-            if stoListUnlocal[row].eventType == "BYPASSED":
-                stoReason =  "found UNLOCALIZED during BYPASSED event (Key/door breached). "
-            elif stoListUnlocal[row].eventType == "closure.":
-                stoReason = "found UNLOCALIZED during area closure"
-            else:
-                stoReason = "Unknown " + stoListUnlocal[row].eventType
-            str = "Bot " + stoListUnlocal[row].botid + \
-                    " was disabled at " + stoListUnlocal[row].reportTime + \
-                    " with sto_reason: " + stoReason + '\n'
-            stoReport.append(str)
+    botList = StoFirstPerBot(stoListUnlocal)
+    for stoLine in botList:
+        if stoLine.eventType == "BYPASSED":
+            stoReason =  "found UNLOCALIZED during BYPASSED event (Key/door breached). "
+        elif stoLine.eventType == "closure.":
+            stoReason = "found UNLOCALIZED during area closure"
+        else:
+            stoReason = "Unknown " + stoLine.eventType
+        str = "Bot " + stoLine.botid + \
+                " was disabled at " + stoLine.reportTime + \
+                " with sto_reason: " + stoReason + '\n'
+        stoReport.append(str)
 
     r1 = "\tNumber of bots disabled-by-safety: " + "{0: <5}".format(len(botList)) + " at Level: " + "{0: <3}".format(level) + \
             " Total log entries: " + "{0: <5}".format(len(stoListUnlocal))
     #print(r1)
     w.writelines('\n' + r1 + '\n')
     w.writelines(stoReport)
-    return (lastEntry + 1)
 
-def StoReasonUnlocalizedAtLevel(log):
+def StoReasonUnlocalizedAtLevel(log, parser, rows):
      stoLevelUnlocal = []
      stoList = []
-     pattern = r"UNLOCALIZED at level"
+     pattern = STO_PATTERN_UNLOCALIZED
      try:
          wFile = open(STO_UNLOCALIZED_AT_LEVEL, "w+")
      except OSError:
@@ -623,40 +613,29 @@ def StoReasonUnlocalizedAtLevel(log):
          for line in log:
              #if line.find(pattern) != -1:
              if pattern in line:
-                 elems = line.split()
-                 stoLevelUnlocal = UnlocalizedAtLevel(elems[8], \
-                         elems[12], \
-                         elems[13], \
-                         StoGetTimeString(elems[0]), \
-                         StoParseStoReason(elems) ) #elems [0].rsplit(TIME_RSPLIT_BG, 1)[0])
+                 fields = parser.parse(pattern, line)
+                 if fields is None:
+                     continue
+                 stoLevelUnlocal = StoRecord(fields['timestamp'], \
+                         '{0: <5}'.format(fields['botid']), \
+                         fields['eventType'], \
+                         StoParseStoReason(fields['stoReason']), \
+                         level = fields['level'])
                  stoList.append(stoLevelUnlocal)
                  stoLevelUnlocal = []
-         stoList = StoMultiSort(list(stoList), (('level', False), ('botid', False)))
+         stoList.sort(key = attrgetter('level', 'botid'))
          reportUnlocalized = "---------------UNLOCALIZED bots disabled-by-safety during access-------------"
         #  if len(stoList) > 0:
             #  print(reportUnlocalized)
          wFile.writelines(reportUnlocalized + '\n')
 
          for entry in stoList:
-            print(f"{entry.reportTime.split('T')[0]},{entry.reportTime.split('T')[1]},{entry.botid},lvl:{entry.level},Unlocalized,{entry.stoReason},-,-")
-         entry = 0
-         while entry < len(stoList):
-             level = stoList[entry].level
-             entry = StoReasonUnlocalizedReport(stoList, level, entry, wFile)
+            rows.append((entry, f"lvl:{entry.level}", "Unlocalized", "-", "-"))
+         for (level,), stoListUnlocal in StoGroups(stoList, ('level',)):
+             StoReasonUnlocalizedReport(stoListUnlocal, level, wFile)
          wFile.close()
 
 
-# List = [botid, nocomm_time, sto_reason, reportTime]
-class OutOfComm:
-    def __init__(self, botid, timeNoComm, eventType, reportTime, logStoReason):
-        self.botid = botid
-        self.timeNoComm = timeNoComm
-        self.eventType = eventType
-        self.reportTime = reportTime
-        self.stoReason = logStoReason
-    def __repr__(self):
-        return repr((self.botid, self.timeNoComm, self.eventType, self.reportTime, self.stoReason))
-
 # List = [botid, nocomm_time, sto_reason, reportTime]
 def StoReasonNoCommPrint(line, stoReport):
     str = "Bot " + "{0: <5}".format(line.botid) + " lost communication for " + line.timeNoComm + \
@@ -664,12 +643,11 @@ def StoReasonNoCommPrint(line, stoReport):
     stoReport.append(str)
     return
 
-def StoReasonNoComm(log):
+def StoReasonNoComm(log, parser):
      stoList = []
-     botList = []
      stoLineNoComm = []
      stoReport = []
-     pattern = r"incommunicado for";
+     pattern = STO_PATTERN_NO_COMM
      try:
          wFile = open(STO_NO_COMM, "w+")
      except OSError:
@@ -679,19 +657,20 @@ def StoReasonNoComm(log):
          for line in log:
              #if line.find(pattern) != -1:
              if pattern in line:
-                 elems = line.split()
-                 stoLineNoComm = OutOfComm(elems[9], \
-                         elems[12], \
+                 fields = parser.parse(pattern, line)
+                 if fields is None:
+                     continue
+                 stoLineNoComm = StoRecord(fields['timestamp'], \
+                         fields['botid'], \
                          "accountant lost communication with bot", \
-                         StoGetTimeString(elems[0]), \
-                         StoParseStoReason(elems) ) #elems [0].rsplit(TIME_RSPLIT_BG, 1)[0])
+                         StoParseStoReason(fields['stoReason']), \
+                         timeNoComm = fields['timeNoComm'])
                  stoList.append(stoLineNoComm)
                  stoLineNoComm = []
-         stoNoCommList = StoDateTimeSort(stoList, 0, len(stoList))
-         for row in range(len(stoNoCommList)):
-             if stoNoCommList[row].botid not in botList:
-                 botList.append[stoNoCommList[row].botid]
-                 StoReasonNoCommPrint(stoNoCommList[row], stoReport)
+         stoNoCommList = StoDateTimeSort(stoList)
+         botList = StoFirstPerBot(stoNoCommList)
+         for stoLine in botList:
+             StoReasonNoCommPrint(stoLine, stoReport)
 
          reportNocomm = "---------------Disabled-by-safety Out Of Comm Bots-------------"
          r1 = "\tNumber of bots disabled-by-safety: " + "{0: <5}".format(len(botList)) + \
@@ -704,14 +683,150 @@ def StoReasonNoComm(log):
          wFile.writelines(stoReport)
          wFile.close()
 
+#------------------------------------------------------------------------------------------
+"""
+   StoCsvLine - one row of the sto_reasons csv
+   input: row - (entry, access_location, structure_access, last_location, gate_close) as the
+          report builders collect them
+   output: date,time,botid,access_location,structure_access,sto_reason,last_location,gate_close
+"""
+#------------------------------------------------------------------------------------------
+def StoCsvLine(row):
+    entry, location, access, lastLocation, gateClose = row
+    stoDate, stoTime = entry.reportTime.split('T')
+    return f"{stoDate},{stoTime},{entry.botid},{location},{access},{entry.stoReason},{lastLocation},{gateClose}\n"
+
+#------------------------------------------------------------------------------------------
+"""
+   StoTableTime - epoch ns (UTC) of a last location / gate closed time, e.g. 07:33:12[21-Mar],
+   STO_TABLE_NAT for '-'. The log leaves out the year: it is the sto's year, or the one before
+   (after) when that puts the time months after (before) the sto, e.g. a [31-Dec] time on Jan 1.
+"""
+#------------------------------------------------------------------------------------------
+def StoTableTime(text, reportTime):
+    match = STO_TABLE_TIME_PATTERN.fullmatch(text)
+    if match is None:
+        return STO_TABLE_NAT
+    year = int(reportTime[:4])
+    stamp = datetime.datetime.strptime(f"{match.group(2)}-{year} {match.group(1)}", '%d-%b-%Y %H:%M:%S')
+    month = stamp.month - int(reportTime[5:7])
+    if month > 6 or month < -6:
+        stamp = stamp.replace(year = year - 1 if month > 6 else year + 1)
+    return int(stamp.replace(tzinfo=datetime.timezone.utc).timestamp()) * 1000000000
+
+#------------------------------------------------------------------------------------------
+"""
+   StoWriteTable - write the rows of the sto_reasons csv as a typed table (see STO_TABLE_NAT),
+   for 4-post-processing.py to load without parsing text:
+   sto_time, utc_offset, botid (int64, or text if a bot id is not a number),
+   access_location, structure_access, sto_reason (categoricals), last_location, gate_close
+"""
+#------------------------------------------------------------------------------------------
+def StoWriteTable(rows, table_file):
+    tableTimes = {}
+    def tableTime(text, reportTime):
+        # the same few times repeat over a day of stos: parse each once
+        key = (text, reportTime[:7])
+        if key not in tableTimes:
+            tableTimes[key] = StoTableTime(text, reportTime)
+        return tableTimes[key]
+
+    entries = [row[0] for row in rows]
+    botids = [entry.botid.strip() for entry in entries]
+    arrays = {
+        'sto_time': numpy.array([round(entry.epoch * 1000000) * 1000 for entry in entries], dtype=numpy.int64),
+        'utc_offset': numpy.array([STO_TABLE_NO_OFFSET if entry.utcOffset is None else entry.utcOffset
+                                   for entry in entries], dtype=numpy.int16),
+        'botid': numpy.array([int(botid) for botid in botids], dtype=numpy.int64) \
+                if all(botid.isdigit() for botid in botids) else numpy.array(botids, dtype=str),
+        'last_location': numpy.array([tableTime(row[3], row[0].reportTime) for row in rows], dtype=numpy.int64),
+        'gate_close': numpy.array([tableTime(row[4], row[0].reportTime) for row in rows], dtype=numpy.int64),
+    }
+    columns = {'access_location': [row[1] for row in rows], 'structure_access': [row[2] for row in rows],
+               'sto_reason': [entry.stoReason for entry in entries]}
+    for column in STO_TABLE_CATEGORIES:
+        categories = sorted(set(columns[column]) - {''})
+        codes = {category: code for code, category in enumerate(categories)}
+        arrays[column + '.codes'] = numpy.array([codes.get(value, -1) for value in columns[column]], dtype=numpy.int32)
+        arrays[column + '.categories'] = numpy.array(categories, dtype=str)
+    with open(table_file, 'wb') as wFile:
+        numpy.savez(wFile, **arrays)
+
+#------------------------------------------------------------------------------------------
+"""
+   StoClassifyLog - single scan of the safety log
+   input: log - iterable of log lines
+   output: dict of sto line pattern -> list of the lines containing that pattern
+   A line is handed to every report builder whose pattern it contains, exactly as if
+   each builder had scanned the whole log, so the log is read (and decompressed) once.
+"""
+#------------------------------------------------------------------------------------------
+def StoClassifyLog(log):
+    stoLines = {pattern: [] for pattern in STO_PATTERNS}
+    classifier = tuple(stoLines.items())
+    for line in log:
+        for pattern, lines in classifier:
+            if pattern in line:
+                lines.append(line)
+    return stoLines
+
+#------------------------------------------------------------------------------------------
+"""
+   StoLineInWindow - True if the line's leading timestamp is within [since, until]
+   since/until: epoch seconds or None (open bound)
+"""
+#------------------------------------------------------------------------------------------
+def StoLineInWindow(line, since, until):
+    try:
+        t = datetime.datetime.fromisoformat(line.split(None, 1)[0]).timestamp()
+    except (ValueError, IndexError):
+        return False
+    return (since is None or t >= since) and (until is None or t <= until)
+
+#------------------------------------------------------------------------------------------
+"""
+   StoReadLog - classify the lines of log_file, optionally only those within [since, until]
+   With the sidecar time index available only that time window of the log is read;
+   otherwise the whole log is scanned and only the classified lines are time-checked.
+"""
+#------------------------------------------------------------------------------------------
+def StoReadLog(log_file, since, until):
+    if (since is not None or until is not None) and log_index is not None:
+        try:
+            window = log_index.read_window(log_file, since, until)
+            return StoClassifyLog(line.decode('utf-8', errors='ignore') for line in window)
+        except FileNotFoundError:
+            print("sas-sto: Could not open file: ", log_file)
+            sys.exit()
+    if log_file.endswith('.gz'):
+        cmdOpen = gzip.open
+    elif log_file.endswith('.xz'):
+        cmdOpen = lzma.open
+    else:
+        cmdOpen = open
+    try:
+        #  print("logFile: ", log_file)
+        log = cmdOpen(log_file, 'rt', errors="ignore")
+    except FileNotFoundError:
+        print("sas-sto: Could not open file: ", log_file)
+        sys.exit()
+    with log:
+        stoLines = StoClassifyLog(log)
+    if since is not None or until is not None:
+        for pattern in stoLines:
+            stoLines[pattern] = [line for line in stoLines[pattern] if StoLineInWindow(line, since, until)]
+    return stoLines
+
 #------------------------------------------------------------------------------------------
 """
    StoPrintHelp - print usage  
 """
 #------------------------------------------------------------------------------------------
 def StoPrintHelp():
-    print("Usage: python3 sas-sto.py [log-file]")
+    print("Usage: python3 sas-sto.py [log-file] [--since TIME] [--until TIME] [--table FILE.npz]")
     print("\tDefault log-file:\t /logs/safety/scpu.log")
+    print("\tTIME:\t ISO time, e.g. 2024-03-21T14:00:00-04:00; only STO lines in [since, until] are reported")
+    print("\tThe sto_reasons csv goes to stdout, or with --table to FILE.npz as a typed table (needs numpy)")
     print("\tScans the log-file to generate reports on disabled-by-safety bots in the following output files:")
     print("\tUnsafe level:\t", STO_UNSAFE_LEVEL)
     print("\tUnsafe aisle:\t", STO_UNSAFE_AISLE)
@@ -727,39 +842,49 @@ def StoPrintHelp():
 """
 #------------------------------------------------------------------------------------------
 def main():
-     if len(sys.argv) == 1:
+     args = sys.argv[1:]
+     bounds = {'--since': None, '--until': None}
+     table_file = None
+     try:
+         if '--table' in args:
+             i = args.index('--table')
+             table_file = args[i + 1]
+             del args[i:i + 2]
+         for flag in bounds:
+             if flag in args:
+                 i = args.index(flag)
+                 bounds[flag] = datetime.datetime.fromisoformat(args[i + 1]).timestamp()
+                 del args[i:i + 2]
+     except (IndexError, ValueError):
+         StoPrintHelp()
+         sys.exit()
+     if table_file is not None and numpy is None:
+         print("sas-sto: --table needs numpy")
+         sys.exit()
+     if len(args) == 0:
          log_file = DEFAULT_LOG_FILE 
      else:
-         if ((sys.argv[1] == '-h') or (sys.argv[1] == '--help') or (len(sys.argv) > 2)):
+         if ((args[0] == '-h') or (args[0] == '--help') or (len(args) > 1)):
              StoPrintHelp()
              sys.exit()
          else:
-             log_file = sys.argv[1]
-     if log_file.endswith('.gz'):
-         cmdOpen = gzip.open
-     elif log_file.endswith('.xz'):
-         cmdOpen = lzma.open
+             log_file = args[0]
+     stoLines = StoReadLog(log_file, bounds['--since'], bounds['--until'])
+     parser = StoParser()
+     rows = []
+     StoReasonUnsafeLevel(stoLines[STO_PATTERN_UNSAFE_LEVEL], parser, rows)
+     StoReasonUnsafeAisle(stoLines[STO_PATTERN_UNSAFE_AISLE], parser, rows)
+     StoReasonUnsafeDriveway(stoLines[STO_PATTERN_UNSAFE_DRIVEWAY], parser, rows)
+     StoReasonInvalidAccessArea(stoLines[STO_PATTERN_INVALID_AREA], parser, rows)
+     StoReasonUnlocalizedAtLevel(stoLines[STO_PATTERN_UNLOCALIZED], parser, rows)
+     StoReasonNoComm(stoLines[STO_PATTERN_NO_COMM], parser)
+     if table_file is None:
+         sys.stdout.writelines(StoCsvLine(row) for row in rows)
      else:
-         cmdOpen = open
-     try:
-        #  print("logFile: ", log_file)
-         log = cmdOpen(log_file, 'rt', errors="ignore")
-     except FileNotFoundError:
-         print("sas-sto: Could not open file: ", log_file)
-         sys.exit()
-     with log:
-         StoReasonUnsafeLevel(log)
-         log.seek(0)
-         StoReasonUnsafeAisle(log)
-         log.seek(0)
-         StoReasonUnsafeDriveway(log)
-         log.seek(0)
-         StoReasonInvalidAccessArea(log)
-         log.seek(0)
-         StoReasonUnlocalizedAtLevel(log)
-         log.seek(0)
-         StoReasonNoComm(log)
-         log.close()
+         StoWriteTable(rows, table_file)
+     # stdout is the sto_reasons csv: the parse counts go to stderr
+     for line in parser.report():
+         print("sas-sto: " + line, file=sys.stderr)
 
 if __name__ == '__main__':
     main()
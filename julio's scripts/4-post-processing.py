@@ -1,19 +1,142 @@
+import argparse
+import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-def clean_raw_data(LOGDATE, SITE_TIME_ZONE):
-    dbsre = pd.read_csv(f'disabled_by_sre-{LOGDATE}.log',sep=' ', names=["timestamp","botid"])
-    data = pd.read_csv(f'sto_reasons_raw_{LOGDATE}.csv', names=["date","time","botid","access_location","structure_access","sto_reason","last_location_time","gate_close_time"])
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+try:
+    # optional: shared timestamp parser (log_time.py) when run from the sas-access-metrics tree
+    from log_time import parse_timestamps, utc_datetime64, local_datetime64
+except ImportError:
+    parse_timestamps = None
+
+def site_times(text, SITE_TIME_ZONE):
+    """
+    (UTC, local) naive datetimes of a column of site timestamps. A timestamp carrying its
+    own UTC offset is converted with it; one without is taken at the whole-hour SITE_TIME_ZONE.
+    """
+    if parse_timestamps is None:
+        local = pd.to_datetime(text)
+        return local - pd.Timedelta(hours=int(SITE_TIME_ZONE)), local
+    ns, offset = parse_timestamps(text, default_offset=int(SITE_TIME_ZONE) * 60)
+    return (pd.Series(utc_datetime64(ns), index=text.index),
+            pd.Series(local_datetime64(ns, offset), index=text.index))
+
+def read_raw_csv(LOGDATE, SITE_TIME_ZONE, directory='.'):
+    """
+    The STOs of sto_reasons_raw_{LOGDATE}.csv (2-sas-sto.py's stdout): botid, access_location,
+    structure_access, sto_reason, sto_time_UTC/local, utc_offset, last_location_UTC, gate_close_UTC.
+    """
+    data = pd.read_csv(os.path.join(directory, f'sto_reasons_raw_{LOGDATE}.csv'), names=["date","time","botid","access_location","structure_access","sto_reason","last_location_time","gate_close_time"])
     data = data.dropna()
     
-    data["sto_time_local"] = data["date"] + "T" + data["time"]
-    data["sto_time_local"] = pd.to_datetime(data["sto_time_local"])
-    dbsre["timestamp"] = pd.to_datetime(dbsre["timestamp"])
+    data["sto_time_UTC"], data["sto_time_local"] = site_times(data["date"] + "T" + data["time"], SITE_TIME_ZONE)
+    # UTC offset of each STO, used to show the UTC gate/location times in site time
+    data["utc_offset"] = data["sto_time_local"] - data["sto_time_UTC"]
     
-    data_sort1 = data.sort_values(by=["botid","sto_time_local"], ascending = [True,True])
+    # Extract year
+    year = data["sto_time_local"].dt.year.iloc[0]
     
-    data_sort1["deltaT"] = data_sort1.groupby("botid")["sto_time_local"].diff().fillna(pd.Timedelta(seconds=0))
+    # Convert gate closure times to datetimes
+    data.loc[data['gate_close_time'] != '-', 'gate_close_UTC'] = pd.to_datetime(
+        data.loc[data['gate_close_time'] != '-', 'gate_close_time'].str.replace(
+            r'(\d{2}:\d{2}:\d{2})\[(\d{2}-[a-zA-Z]{3})\]', fr'\2-{year} \1', regex=True), format='%d-%b-%Y %H:%M:%S')
+    
+    data.loc[data['last_location_time'] != '-', 'last_location_UTC'] = pd.to_datetime(
+        data.loc[data['last_location_time'] != '-', 'last_location_time'].str.replace(
+            r'(\d{2}:\d{2}:\d{2})\[(\d{2}-[a-zA-Z]{3})\]', fr'\2-{year} \1', regex=True), format='%d-%b-%Y %H:%M:%S')
+    
+    return data.drop(["date", "time", "gate_close_time", "last_location_time"], axis=1)
+
+def read_raw_table(table_file, SITE_TIME_ZONE):
+    """
+    read_raw_csv from the typed table 2-sas-sto.py --table writes: times are already UTC epoch ns
+    with the offset each STO was logged with, text columns categoricals, so nothing is re-parsed.
+    A time logged without an offset is site time, taken at the whole-hour SITE_TIME_ZONE.
+    """
+    with np.load(table_file, allow_pickle=False) as table:
+        sto_time = table['sto_time']
+        offset = table['utc_offset'].astype(np.int64)
+        no_offset = offset == np.iinfo(np.int16).min
+        sto_time = np.where(no_offset, sto_time - int(SITE_TIME_ZONE) * 3600 * 10**9, sto_time)
+        offset = np.where(no_offset, int(SITE_TIME_ZONE) * 60, offset)
+        data = pd.DataFrame({
+            'botid': table['botid'],
+            'access_location': pd.Categorical.from_codes(table['access_location.codes'], table['access_location.categories']),
+            'structure_access': pd.Categorical.from_codes(table['structure_access.codes'], table['structure_access.categories']),
+            'sto_reason': pd.Categorical.from_codes(table['sto_reason.codes'], table['sto_reason.categories']),
+            'sto_time_UTC': sto_time.astype('datetime64[ns]'),
+            'utc_offset': pd.to_timedelta(offset, unit='min'),
+            'last_location_UTC': table['last_location'].astype('datetime64[ns]'),
+            'gate_close_UTC': table['gate_close'].astype('datetime64[ns]'),
+        })
+    data["sto_time_local"] = data["sto_time_UTC"] + data["utc_offset"]
+    return data.dropna(subset=['access_location', 'structure_access', 'sto_reason'])
+
+def sre_matches(stos, dbsre, window=pd.Timedelta(seconds=120), flag_window=pd.Timedelta(seconds=30)):
+    """
+    The disabled_by_sre times of each STO's bot in the window before its gate closed (UTC):
+    (disabled_by_sre: one within flag_window, gate_deltas: str of the seconds from each of them
+    to the gate closure), both aligned with stos. Both sides are sorted by time once and matched
+    with as-of joins by bot, instead of a scan of dbsre per STO.
+    """
+    flags = np.zeros(len(stos), dtype=bool)
+    gate_deltas = np.full(len(stos), "[]", dtype=object)
+
+    # dbsre by (botid, time): a bot's times are a contiguous, sorted block; pos indexes it
+    sre = pd.DataFrame({"botid": dbsre["botid"].to_numpy(),
+                        "timestamp": dbsre["timestamp"].to_numpy().astype("datetime64[ns]")})
+    sre = sre.sort_values(["botid", "timestamp"], kind="stable").reset_index(drop=True)
+    sre["pos"] = np.arange(len(sre))
+    sre_by_time = sre.sort_values("timestamp", kind="stable")
+    sre_times = sre["timestamp"].to_numpy().astype(np.int64)
+
+    gate = stos["gate_close_UTC"].to_numpy().astype("datetime64[ns]")
+    left = pd.DataFrame({"botid": stos["botid"].to_numpy(), "gate": gate, "window_start": gate - window.to_timedelta64(),
+                         "row": np.arange(len(stos))})
+    left = left[left["gate"].notna()].sort_values("gate", kind="stable")
+    if len(left) == 0 or len(sre) == 0:
+        return flags, gate_deltas
+
+    def block_end(on):
+        # end of the bot's block of times before on: one past the last earlier time, else the block start
+        last = pd.merge_asof(left, sre_by_time, left_on=on, right_on="timestamp", by="botid",
+                             allow_exact_matches=False)["pos"].to_numpy()
+        return np.where(np.isnan(last), block_start, last + 1).astype(np.int64)
+    block_start = np.searchsorted(sre["botid"].to_numpy(), left["botid"].to_numpy(), side="left")
+    hi = block_end("gate")
+    lo = block_end("window_start")
+    counts = hi - lo
+
+    gate = left["gate"].to_numpy().astype(np.int64)
+    rows = left["row"].to_numpy()
+    # the latest time before the gate closed decides the flag
+    flags[rows] = (counts > 0) & (gate - sre_times[np.maximum(hi - 1, 0)] <= flag_window.value)
+    # every (STO, dbsre) pair of the windows, in time order per STO
+    pair_sto = np.repeat(np.arange(len(left)), counts)
+    pair_sre = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    # seconds as Timedelta.total_seconds() gives them: whole microseconds
+    us = (gate[pair_sto] - sre_times[pair_sre]) // 1000
+    seconds = (us // 10**6) + (us % 10**6) / 1e6
+    gate_deltas[rows] = [str(deltas.tolist()) for deltas in np.split(seconds, np.cumsum(counts)[:-1])]
+    return flags, gate_deltas
+
+def clean_raw_data(LOGDATE, SITE_TIME_ZONE, directory='.'):
+    dbsre = pd.read_csv(os.path.join(directory, f'disabled_by_sre-{LOGDATE}.log'),sep=' ', names=["timestamp","botid"])
+    # the typed table of 2-sas-sto.py --table when there is one, else its csv output
+    table_file = os.path.join(directory, f'sto_reasons_raw_{LOGDATE}.npz')
+    if os.path.exists(table_file):
+        data = read_raw_table(table_file, SITE_TIME_ZONE)
+    else:
+        data = read_raw_csv(LOGDATE, SITE_TIME_ZONE, directory)
+    dbsre["timestamp"] = site_times(dbsre["timestamp"], SITE_TIME_ZONE)[0]
+    
+    data_sort1 = data.sort_values(by=["botid","sto_time_UTC"], ascending = [True,True])
+    
+    data_sort1["deltaT"] = data_sort1.groupby("botid")["sto_time_UTC"].diff().fillna(pd.Timedelta(seconds=0))
     
     data_sort1['remove'] = (
         # Delta is less than 1.5 minutes
@@ -25,57 +148,25 @@ def clean_raw_data(LOGDATE, SITE_TIME_ZONE):
     )
         
     data_cleaned = data_sort1[~data_sort1['remove']].drop(columns=['remove'])
-    data_cleaned = data_cleaned.drop(["deltaT", "date", "time"],axis=1)
-    
-    # Extract year
-    year = data["sto_time_local"].dt.year.iloc[0]
-    
-    # Convert gate closure times to datetimes
-    data_cleaned.loc[data_cleaned['gate_close_time'] != '-', 'gate_close_UTC'] = pd.to_datetime(
-        data_cleaned.loc[data_cleaned['gate_close_time'] != '-', 'gate_close_time'].str.replace(
-            r'(\d{2}:\d{2}:\d{2})\[(\d{2}-[a-zA-Z]{3})\]', fr'\2-{year} \1', regex=True), format='%d-%b-%Y %H:%M:%S')
-    
-    data_cleaned.loc[data_cleaned['last_location_time'] != '-', 'last_location_UTC'] = pd.to_datetime(
-        data_cleaned.loc[data_cleaned['last_location_time'] != '-', 'last_location_time'].str.replace(
-            r'(\d{2}:\d{2}:\d{2})\[(\d{2}-[a-zA-Z]{3})\]', fr'\2-{year} \1', regex=True), format='%d-%b-%Y %H:%M:%S')
+    data_cleaned = data_cleaned.drop(["deltaT"],axis=1)
     
     # Convert gate_close and last_location times from UTC time to local time
-    data_cleaned["gate_close_local"] = data_cleaned["gate_close_UTC"] + pd.Timedelta(hours=int(SITE_TIME_ZONE))
-    data_cleaned["last_location_local"] = data_cleaned["last_location_UTC"] + pd.Timedelta(hours=int(SITE_TIME_ZONE))
-    
-    # Convert sto_time from local time to UTC time
-    data_cleaned["sto_time_UTC"] = data_cleaned["sto_time_local"] - pd.Timedelta(hours=int(SITE_TIME_ZONE))
+    data_cleaned["gate_close_local"] = data_cleaned["gate_close_UTC"] + data_cleaned["utc_offset"]
+    data_cleaned["last_location_local"] = data_cleaned["last_location_UTC"] + data_cleaned["utc_offset"]
   
     # Flag initialization
     data_cleaned['disabled_by_sre'] = False
     data_cleaned['gate_deltas'] = ''
     
-    # Iterate through each row in df1 where 'reason' is 'aisle' or 'drive'
-    for idx, row in data_cleaned[data_cleaned['sto_reason'].isin(['0x60000(Failed_to_localize)'])].iterrows():
-        id_value = row['botid']
-        gate_time = row['gate_close_local']
-        
-        matching_rows = dbsre[dbsre['botid'] == id_value]
-        
-        deltas = []
-        for timestamp2 in matching_rows['timestamp']:
-            delta = (gate_time - timestamp2).total_seconds()
-            if delta > 0 and delta <= 120:
-                deltas.append(delta)
-        data_cleaned.at[idx,'gate_deltas'] = str(deltas)
-        
-        # Check the timestamp condition
-        disable_flag = any(
-            (gate_time - timestamp).total_seconds() <= 30 and (gate_time - timestamp).total_seconds() > 0
-            for timestamp in matching_rows['timestamp']
-        )
-        
-        # Set the disable flag in df1
-        data_cleaned.at[idx, 'disabled_by_sre'] = disable_flag
+    # Failed_to_localize STOs: disabled by SRE if the bot was disabled up to 30s before its gate closed
+    # (disabled_by_sre times were converted to UTC above); gate_deltas lists those up to 120s before
+    failed = data_cleaned['sto_reason'].isin(['0x60000(Failed_to_localize)'])
+    data_cleaned.loc[failed, 'disabled_by_sre'], data_cleaned.loc[failed, 'gate_deltas'] = \
+        sre_matches(data_cleaned[failed], dbsre)
     
-    data_cleaned = data_cleaned.drop(["gate_close_time", "gate_deltas", "last_location_time"],axis=1)
+    data_cleaned = data_cleaned.drop(["gate_deltas"],axis=1)
     
-    data_cleaned = data_cleaned.sort_values(by="sto_time_local", ascending=True)
+    data_cleaned = data_cleaned.sort_values(by="sto_time_UTC", ascending=True)
     data_cleaned["sto_time_local"]=data_cleaned["sto_time_local"].dt.strftime('%Y-%m-%d %H:%M:%S')
     data_cleaned["sto_time_UTC"]=data_cleaned["sto_time_UTC"].dt.strftime('%Y-%m-%d %H:%M:%S')
     
@@ -88,13 +179,15 @@ def clean_raw_data(LOGDATE, SITE_TIME_ZONE):
     return data_cleaned
 
 
-def save_plot(data_cleaned, LOGDATE):
+def save_plot(data_cleaned, LOGDATE, directory='.'):
+    if isinstance(data_cleaned['sto_reason'].dtype, pd.CategoricalDtype):  # loaded from the typed table
+        data_cleaned['sto_reason'] = data_cleaned['sto_reason'].cat.add_categories(['Disabled_by_SRE'])
     data_cleaned.loc[data_cleaned['disabled_by_sre'] == True, 'sto_reason'] = 'Disabled_by_SRE'
     
     data_cleaned['sto_time_local'] = pd.to_datetime(data_cleaned['sto_time_local'])
     data_cleaned['hour_group'] = data_cleaned['sto_time_local'].dt.floor('h')  # Round to the nearest hour
     
-    category_counts = data_cleaned.groupby(['hour_group', 'sto_reason'])['botid'].nunique().unstack(fill_value=0)
+    category_counts = data_cleaned.groupby(['hour_group', 'sto_reason'], observed=True)['botid'].nunique().unstack(fill_value=0)
     
     # Represent 25 hours (3AM to 3AM)
     start_date = data_cleaned['sto_time_local'].min().date()
@@ -166,12 +259,80 @@ def save_plot(data_cleaned, LOGDATE):
             ax.text(x, y, f"{int(height)}", ha='center', va='center', fontsize=8, color='black')
 
     plt.tight_layout()
-    plt.savefig(f"sto_reasons_chart_{LOGDATE}.png")
+    plt.savefig(os.path.join(directory, f"sto_reasons_chart_{LOGDATE}.png"))
+    # a batch run draws many charts in one process
+    plt.close(fig)
+
+
+def process_day(site_dir, logdate, timezone):
+    """
+    One day of one site, as main() runs it: writes sto_reasons_{logdate}.csv and the chart
+    into site_dir and returns the cleaned STOs, with site and logdate columns in front.
+    """
+    data_cleaned = clean_raw_data(logdate, timezone, site_dir)
+    data_cleaned.to_csv(os.path.join(site_dir, f"sto_reasons_{logdate}.csv"), index = False)
+    save_plot(data_cleaned.copy(), logdate, site_dir)
+    data_cleaned.insert(0, 'logdate', logdate)
+    data_cleaned.insert(0, 'site', os.path.basename(os.path.normpath(site_dir)))
+    return data_cleaned
+
+
+def batch_main(argv):
+    """
+    Every day from FIRST to LAST (yyyymmdd) of every SITE_DIR:TIMEZONE whose raw files are there,
+    the days processed side by side in worker processes; all of them are also written to one
+    combined table. e.g. post-processing.py --batch 20250201 20250228 NBF:-6 SITE2:-5
+    """
+    arg_parser = argparse.ArgumentParser(prog="post-processing.py --batch",
+                                         description="Post-process a range of days for several sites.")
+    arg_parser.add_argument('first', help="first log date (yyyymmdd)")
+    arg_parser.add_argument('last', help="last log date (yyyymmdd)")
+    arg_parser.add_argument('sites', nargs='+', help="SITE_DIR:TIMEZONE, e.g. /home/jreyes/sto_reports/NBF:-6")
+    arg_parser.add_argument('--jobs', type=int, help="days processed side by side (default: CPU count)")
+    arg_parser.add_argument('--output', help="combined table (default: sto_reasons_FIRST-LAST.csv)")
+    args = arg_parser.parse_args(argv)
+
+    # charts are only saved: no display, in this process or the workers
+    os.environ['MPLBACKEND'] = 'Agg'
+    plt.switch_backend('Agg')
+
+    logdates = pd.date_range(pd.to_datetime(args.first, format='%Y%m%d'),
+                             pd.to_datetime(args.last, format='%Y%m%d')).strftime('%Y%m%d')
+    days = []
+    for site in args.sites:
+        site_dir, timezone = site.rsplit(':', 1)
+        for logdate in logdates:
+            raw = [os.path.join(site_dir, f'sto_reasons_raw_{logdate}.{ext}') for ext in ('csv', 'npz')]
+            if any(os.path.exists(path) for path in raw) and \
+                    os.path.exists(os.path.join(site_dir, f'disabled_by_sre-{logdate}.log')):
+                days.append((site_dir, logdate, timezone))
+            else:
+                print(f"{site_dir} {logdate}: no raw files, skipped")
+
+    frames = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [(day, pool.submit(process_day, *day)) for day in days]
+        for (site_dir, logdate, timezone), future in futures:
+            try:
+                frames.append(future.result())
+                print(f"{site_dir} {logdate}: done")
+            except Exception as error:
+                print(f"{site_dir} {logdate}: failed ({error!r})")
+
+    output = args.output or f"sto_reasons_{args.first}-{args.last}.csv"
+    if frames:
+        pd.concat(frames, ignore_index=True).to_csv(output, index = False)
+        print(f"{len(frames)} days written to {output}")
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch_main(sys.argv[2:])
+        return
     if len(sys.argv) != 3:
         print("Must input log date (yyyymmdd) and site timezone (-hr)")
+        print("or --batch FIRST LAST SITE_DIR:TIMEZONE [...] (see --batch --help)")
+        return
     else:
         logdate = sys.argv[1]
         timezone = sys.argv[2]
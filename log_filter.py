@@ -0,0 +1,85 @@
+import re
+from functools import lru_cache
+
+# Shortest substring worth using as a prefilter anchor
+MIN_ANCHOR_LEN = 4
+
+HOSTNAME_PATTERN = re.compile(r'(\bbotguardian\d+)\.mservices\.[^\s]+')
+
+
+def anchor_literals(keywords):
+    """
+    Picks a few substrings such that every keyword contains at least one of them
+    (greedy set cover, longest substring first), e.g. ["LockedSetSafe"] for the two
+    LockedSet* keywords or [" dwy ", " aisle ", "level "] for the snapshot tags.
+    A line without any anchor cannot match, so most lines are rejected by one anchor search.
+    """
+    uncovered = set(keywords)
+    anchors = []
+    while uncovered:
+        best, best_cover = None, set()
+        for keyword in uncovered:
+            for i in range(len(keyword)):
+                for j in range(i + MIN_ANCHOR_LEN, len(keyword) + 1):
+                    candidate = keyword[i:j]
+                    cover = {k for k in uncovered if candidate in k}
+                    if (len(cover), len(candidate)) > (len(best_cover), len(best or '')):
+                        best, best_cover = candidate, cover
+        if best is None:  # keyword shorter than MIN_ANCHOR_LEN
+            best = min(uncovered, key=len)
+            best_cover = {k for k in uncovered if best in k}
+        anchors.append(best)
+        uncovered -= best_cover
+    return tuple(anchors)
+
+
+class KeywordMatcher:
+    """
+    Include/exclude keyword filter shared by the extraction scripts.
+    A line is kept if it contains an include keyword as a whole word and no exclude phrase.
+    Lines are first searched for the include keywords' anchors (case-insensitive, like the
+    keywords themselves), and the word-boundary regex only runs on those few candidates.
+    No lowercase copy of the line is made.
+    """
+
+    def __init__(self, include_keywords, exclude_phrases):
+        self.include_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in include_keywords) + r')\b',
+                                          re.IGNORECASE)
+        self.exclude_pattern = re.compile(r'|'.join(re.escape(p) for p in exclude_phrases), re.IGNORECASE)
+        self.anchors = anchor_literals(include_keywords)
+        anchor_alternatives = '|'.join(re.escape(anchor) for anchor in self.anchors)
+        self.anchor_pattern = re.compile(anchor_alternatives, re.IGNORECASE)
+        self.byte_anchor_pattern = re.compile(anchor_alternatives.encode('utf-8'), re.IGNORECASE)
+
+    def match(self, line):
+        if self.anchor_pattern.search(line) is None:
+            return False
+        return self.include_pattern.search(line) is not None and self.exclude_pattern.search(line) is None
+
+    def scan(self, buf, start=0, end=None):
+        """
+        Bytes-mode prefilter over a whole buffer (bytes or mmap): searches it for the anchors
+        and yields, in order, each line of buf[start:end] containing one, still undecoded.
+        Lines without an anchor are never split out or decoded.
+        """
+        if end is None:
+            end = len(buf)
+        search = self.byte_anchor_pattern.search
+        hit = search(buf, start, end)
+        while hit is not None:
+            newline = buf.rfind(b'\n', start, hit.start())
+            line_start = newline + 1 if newline != -1 else start
+            newline = buf.find(b'\n', hit.start(), end)
+            line_end = newline + 1 if newline != -1 else end
+            yield buf[line_start:line_end]
+            hit = search(buf, line_end, end)
+
+    def clean(self, line):
+        # Clean the hostname: botguardianX.mservices.xxx06020-c.sxxxxxxx → botguardianX
+        return HOSTNAME_PATTERN.sub(r'\1', line.strip())
+
+
+@lru_cache(maxsize=None)
+def get_matcher(include_keywords, exclude_phrases):
+    """Cached per keyword set, so each worker process compiles a matcher once."""
+    return KeywordMatcher(include_keywords, exclude_phrases)
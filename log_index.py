@@ -0,0 +1,135 @@
+import bisect
+import json
+import os
+from datetime import datetime
+
+from log_reader import open_log
+from log_time import TIMESTAMP_LEN
+
+# One index entry per this many seconds of log time
+INDEX_INTERVAL = 60
+
+
+def index_path(log_file):
+    return log_file + '.idx.json'
+
+
+def line_epoch(line):
+    """Epoch seconds of a log line's leading timestamp (str or bytes), or None if it has none."""
+    head = line[:TIMESTAMP_LEN]
+    if isinstance(head, bytes):
+        head = head.decode('ascii', errors='ignore')
+    try:
+        return datetime.fromisoformat(head).timestamp()
+    except ValueError:
+        return None
+
+
+def to_epoch(t):
+    """Accepts epoch seconds, a datetime or an ISO string; naive times are taken as local time."""
+    if t is None or isinstance(t, (int, float)):
+        return t
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t)
+    return t.timestamp()
+
+
+def build_index(log_file, interval=INDEX_INTERVAL):
+    """
+    Scans a log once and writes a sidecar mapping time to byte offset.
+    An entry (t, offset) is recorded the first time a line's timestamp reaches a new
+    interval bucket t, so every line before offset is earlier than t.
+    For .gz/.xz logs the offsets are positions in the decompressed stream.
+    """
+    entries = []
+    last_bucket = None
+    last_head = None
+    offset = 0
+    with open_log(log_file) as f:
+        for raw in f:
+            head = raw[:19]  # only re-parse when the second changes
+            if head != last_head:
+                last_head = head
+                epoch = line_epoch(raw)
+                if epoch is not None:
+                    bucket = int(epoch // interval) * interval
+                    if last_bucket is None or bucket > last_bucket:
+                        entries.append([bucket, offset])
+                        last_bucket = bucket
+            offset += len(raw)
+
+    st = os.stat(log_file)
+    index = {'log_size': st.st_size, 'log_mtime_ns': st.st_mtime_ns,
+             'interval': interval, 'length': offset, 'entries': entries}
+    tmp_path = index_path(log_file) + '.part'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path(log_file))
+    return index
+
+
+def load_index(log_file, interval=INDEX_INTERVAL):
+    """Returns the sidecar index, rebuilding it when missing or when the log has changed since."""
+    st = os.stat(log_file)
+    try:
+        with open(index_path(log_file)) as f:
+            index = json.load(f)
+        if (index['log_size'] == st.st_size and index['log_mtime_ns'] == st.st_mtime_ns
+                and index['interval'] == interval):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_index(log_file, interval)
+
+
+def window_offsets(log_file, since=None, until=None):
+    """
+    Byte range (start, end) holding every line timestamped in [since, until].
+    end is None when the window runs to the end of the log. The range ends one interval
+    after until, so lines slightly out of order (several hosts write the same log) are kept.
+    """
+    since, until = to_epoch(since), to_epoch(until)
+    if since is None and until is None:
+        return 0, None
+    index = load_index(log_file)
+    keys = [t for t, _ in index['entries']]
+    start = 0
+    end = None
+    if since is not None:
+        # every line before the last entry at or before since is earlier than since
+        i = bisect.bisect_right(keys, since) - 1
+        if i >= 0:
+            start = index['entries'][i][1]
+    if until is not None:
+        i = bisect.bisect_right(keys, until + index['interval'])
+        if i < len(keys):
+            end = index['entries'][i][1]
+    return start, end
+
+
+def in_window(line, since=None, until=None):
+    """Exact per-line check, applied to the lines read from a window_offsets range."""
+    epoch = line_epoch(line)
+    if epoch is None:
+        return True
+    return (since is None or epoch >= since) and (until is None or epoch <= until)
+
+
+def read_window(log_file, since=None, until=None):
+    """
+    Yields the raw (bytes) lines of a log timestamped in [since, until], reading only that window.
+    Plain logs are entered with a seek; gzip/xz logs have no restart points inside a
+    deflate/lzma stream, so the prefix is decompressed and discarded without splitting lines.
+    """
+    start, end = window_offsets(log_file, since, until)
+    since, until = to_epoch(since), to_epoch(until)
+    pos = start
+    with open_log(log_file) as f:
+        if start:
+            f.seek(start)
+        for raw in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(raw)
+            if in_window(raw, since, until):
+                yield raw
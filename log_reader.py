@@ -0,0 +1,27 @@
+import gzip
+import io
+import lzma
+
+# Read buffer used for every log stream; large reads keep per-call overhead low on multi-GB logs
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def is_compressed(log_file):
+    return log_file.endswith(('.gz', '.xz'))
+
+
+def open_log(log_file, mode='rb', newline=None):
+    """
+    Opens a plain, .gz or .xz log for reading (picked by extension, like 2-sas-sto.py),
+    so compressed archives stream straight into the filters without unzipping to disk.
+    mode is 'rb' for bytes or 'rt' for text (UTF-8, undecodable bytes dropped).
+    """
+    if log_file.endswith('.gz'):
+        raw = io.BufferedReader(gzip.open(log_file, 'rb'), buffer_size=READ_BUFFER_SIZE)
+    elif log_file.endswith('.xz'):
+        raw = io.BufferedReader(lzma.open(log_file, 'rb'), buffer_size=READ_BUFFER_SIZE)
+    else:
+        raw = open(log_file, 'rb', buffering=READ_BUFFER_SIZE)
+    if 't' in mode:
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='ignore', newline=newline)
+    return raw
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Every scpu timestamp has the same layout, e.g. 2025-07-09T03:56:54.082-04:00
+TIMESTAMP_LEN = 29
+
+# int64 value of NaT, used for values that are not timestamps
+NAT = np.iinfo(np.int64).min
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+NS_PER_SECOND = 10 ** 9
+NS_PER_MINUTE = 60 * NS_PER_SECOND
+
+# Layout check: separator byte expected at each position, and the digit positions
+_SEPARATORS = {4: b'-', 7: b'-', 13: b':', 16: b':', 19: b'.', 26: b':'}
+_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22, 24, 25, 27, 28]
+
+# The same layout without the UTC offset (2025-07-09T03:56:54.082), e.g. the STO report CSVs
+NAIVE_TIMESTAMP_LEN = 23
+
+
+def _field(digits, start, end):
+    value = digits[:, start].astype(np.int64)
+    for i in range(start + 1, end):
+        value = value * 10 + digits[:, i]
+    return value
+
+
+def _parse_one(text, default_offset):
+    """Slow path for values not in the fixed layout (other precision, 'Z', no offset, ...)."""
+    text = text.strip().strip('"')
+    try:
+        t = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            t = datetime.fromisoformat(text.split(None, 1)[0])
+        except (ValueError, IndexError):
+            return NAT, 0
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone(timedelta(minutes=default_offset)))
+    offset = t.utcoffset() // timedelta(minutes=1)
+    return (t - EPOCH) // timedelta(microseconds=1) * 1000, offset
+
+
+def parse_timestamps(values, default_offset=0):
+    """
+    Parses a column or batch of log timestamps (str or bytes; whole log lines are fine,
+    only the leading timestamp is read) into UTC epoch nanoseconds.
+    Returns (ns, offset): int64 UTC nanoseconds (NAT where a value is not a timestamp) and
+    the int16 UTC offset in minutes each value was written with, so local time is ns + offset.
+    Values in the scpu layout, or in that layout without its offset (taken at default_offset),
+    are decoded from fixed byte positions for the whole batch at once; anything else goes
+    through datetime.fromisoformat, naive times also taken at default_offset.
+    """
+    if hasattr(values, 'notna'):  # pandas column: empty cells are dropped before converting
+        present = values.notna().to_numpy()
+        if not present.all():
+            ns = np.full(len(present), NAT, dtype=np.int64)
+            offset = np.zeros(len(present), dtype=np.int16)
+            ns[present], offset[present] = parse_timestamps(values[present], default_offset)
+            return ns, offset
+    values = values.tolist() if hasattr(values, 'tolist') else list(values)
+    try:
+        raw = np.array(values, dtype='S%d' % TIMESTAMP_LEN)
+    except (UnicodeEncodeError, TypeError, ValueError):
+        raw = np.array([v[:TIMESTAMP_LEN].encode('ascii', 'replace') if isinstance(v, str)
+                        else v if isinstance(v, bytes) else b'' for v in values], dtype='S%d' % TIMESTAMP_LEN)
+    raw = raw.view(np.uint8).reshape(len(values), TIMESTAMP_LEN)
+    ns = np.full(len(values), NAT, dtype=np.int64)
+    offset = np.zeros(len(values), dtype=np.int16)
+
+    # Rows in the scpu layout are decoded together, with those lacking only the offset (naive);
+    # empty cells are never touched
+    is_digit = raw - np.uint8(ord('0')) <= 9  # non-digits wrap around to > 9
+    local = is_digit[:, [i for i in _DIGITS if i < NAIVE_TIMESTAMP_LEN]].all(axis=1)
+    for pos, sep in _SEPARATORS.items():
+        if pos < NAIVE_TIMESTAMP_LEN:
+            local &= raw[:, pos] == sep[0]
+    local &= (raw[:, 10] == ord('T')) | (raw[:, 10] == ord(' '))
+    naive = local & (raw[:, NAIVE_TIMESTAMP_LEN] == 0)  # nothing after the milliseconds
+    fixed = local & ((raw[:, 23] == ord('+')) | (raw[:, 23] == ord('-'))) & (raw[:, 26] == ord(':'))
+    fixed &= is_digit[:, [i for i in _DIGITS if i > NAIVE_TIMESTAMP_LEN]].all(axis=1)
+    fixed |= naive
+    rows = fixed if not fixed.all() else slice(None)
+    digits = raw[rows] - np.uint8(ord('0'))
+    negative = raw[rows, 23] == ord('-')
+
+    year, month, day = _field(digits, 0, 4), _field(digits, 5, 7), _field(digits, 8, 10)
+    months = (year - 1970) * 12 + month - 1
+    days = months.astype('M8[M]').astype('M8[D]').astype(np.int64) + day - 1
+    seconds = ((days * 24 + _field(digits, 11, 13)) * 60 + _field(digits, 14, 16)) * 60 + _field(digits, 17, 19)
+    minutes = _field(digits, 24, 26) * 60 + _field(digits, 27, 29)
+    minutes = np.where(negative, -minutes, minutes)
+    minutes = np.where(naive[rows], default_offset, minutes)
+    ns[rows] = seconds * NS_PER_SECOND + _field(digits, 20, 23) * 1000000 - minutes * NS_PER_MINUTE
+    offset[rows] = minutes
+
+    # only other values that can start a timestamp take the slow path; None/NaN/'' cells are skipped
+    first = raw[:, 0]
+    slow = ~fixed & (((first >= ord('0')) & (first <= ord('9'))) | (first == ord('"')) | (first == ord(' ')))
+    for i in np.flatnonzero(slow):
+        v = values[i]
+        if isinstance(v, bytes):
+            v = v.decode('ascii', 'replace')
+        if isinstance(v, str):
+            ns[i], offset[i] = _parse_one(v, default_offset)
+    return ns, offset
+
+
+def parse_timestamp(text, default_offset=0):
+    """
+    Single-value parse_timestamps: (UTC epoch ns, offset minutes), (NAT, 0) if not a timestamp.
+    One value does not pay for numpy; datetime.fromisoformat reads the same layout.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('ascii', 'replace')
+    return _parse_one(text, default_offset)
+
+
+def utc_datetime64(ns):
+    """UTC epoch nanoseconds as naive datetime64[ns] UTC wall time (NAT becomes NaT)."""
+    return np.asarray(ns, dtype=np.int64).view('M8[ns]')
+
+
+def local_datetime64(ns, offset):
+    """Wall-clock time where each value was logged, as naive datetime64[ns]."""
+    ns = np.asarray(ns, dtype=np.int64)
+    local = ns + np.asarray(offset, dtype=np.int64) * NS_PER_MINUTE
+    return np.where(ns == NAT, NAT, local).view('M8[ns]')
+
+
+def to_datetime(ns, offset):
+    """One value as an aware datetime in its original offset, or None for NAT."""
+    if ns == NAT:
+        return None
+    utc = EPOCH + timedelta(microseconds=int(ns) // 1000)
+    return utc.astimezone(timezone(timedelta(minutes=int(offset))))
+
+
+def format_timestamps(ns, offset):
+    """
+    Inverse of parse_timestamps: ISO strings in the scpu layout and original offset
+    (2025-07-09T03:56:54.082-04:00), None for NAT.
+    """
+    ns = np.asarray(ns, dtype=np.int64)
+    offset = np.asarray(offset, dtype=np.int64)
+    text = np.datetime_as_string(local_datetime64(ns, offset).astype('M8[ms]'), unit='ms')
+    sign = np.where(offset < 0, '-', '+')
+    hours, minutes = np.divmod(np.abs(offset), 60)
+    zone = np.char.add(np.char.add(sign, np.char.zfill(hours.astype(str), 2)),
+                       np.char.add(':', np.char.zfill(minutes.astype(str), 2)))
+    out = np.char.add(text, zone).astype(object)
+    out[ns == NAT] = None
+    return out
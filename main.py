@@ -12,66 +12,149 @@
 # analyze data structure and attempt to compute dT between transitions of states
 # 1_sasAccessTimeDataExtraction.py
 
+import argparse
 import os
 
 from sasAccessTimeDataExtraction import extract_and_filter_logs
-from reshape_list_to_table import reshape_log_to_table
-from table_access_time import compute_transition_deltas
+from reshape_list_to_table import reshape_log_to_table, cycle_table_text
+from transition_dataset import extract_transition_dataset, reshape_dataset_to_table
+from table_access_time import compute_transition_deltas, compute_latency_matrix, transition_deltas, latency_matrix
 from histogram import plot_histograms
 from AccessGrantedTimeline import plot_access_granted_timeline
+from stage_cache import Stage, run_stages
 
-def run_combined_pipeline(filtered_csv, base='all_logs'):
+# Raw logs, under 'raw logs/'
+LOGFILES = [
+    'scpu-20250127.log',
+    'scpu-20250128.log',
+    'scpu-20250129.log',
+    'scpu-20250130.log',
+    'scpu-20250131.log',
+    'scpu-20250205.log',
+    'scpu-20250206.log',
+    'scpu-20250207.log',
+    'scpu-20250208.log',
+    'scpu-20250209.log',
+    'scpu-20250210.log',
+    'scpu-20250211.log',
+    'scpu-20250212.log',
+    'scpu-20250213.log',
+    'scpu-20250214.log',
+    'scpu-20250215.log',
+    'scpu-20250216.log',
+    'scpu-20250217.log',
+    'scpu-20250218.log',
+    'scpu-20250219.log',
+    'scpu-20250220.log',
+    'scpu-20250221.log',
+    'scpu-20250222.log',
+    'scpu-20250223.log',
+    'scpu-20250224.log',
+    'scpu-20250225.log',
+    'scpu-20250226.log',
+    'scpu-20250227.log',
+    'scpu-20250228.log',
+    'scpu.log',
+    'scpu-20250710.log'
+]
+
+
+def pipeline_stages(logfiles, base='all_logs', filtered_csv=None, workers=os.cpu_count()):
+    """
+    The pipeline as run_stages stages, in order. The dataset stage keeps the filtered transitions
+    as a typed, day/host partitioned dataset (transition_dataset.py), which reshape reads instead
+    of parsing the filtered log again. With filtered_csv an existing filtered log is the input,
+    the filter and dataset stages are left out and reshape parses that log.
+    """
+    dataset_dir = f"{base}_transitions"
     transitions_csv = f"{base}_parsed_transitions.csv"
     deltas_csv = f"{base}_transition_deltas.csv"
+    latency_csv = f"{base}_latency_matrix.csv"
     histogram_png = f"{base}_histogram.png"
     timeline_png = f"{base}_access_granted_timeline.png"
-    
-    # reshape_log_to_table(filtered_csv, output_csv=transitions_csv)
-    # compute_transition_deltas(transitions_csv, output_csv=deltas_csv)
-    # plot_histograms(deltas_csv, png_out=histogram_png)
-    plot_access_granted_timeline(transitions_csv, png_out=timeline_png)
 
-if __name__ == "__main__":
-    logfiles = [
-        'scpu-20250127.log',
-        'scpu-20250128.log',
-        'scpu-20250129.log',
-        'scpu-20250130.log',
-        'scpu-20250131.log',
-        'scpu-20250205.log',
-        'scpu-20250206.log',
-        'scpu-20250207.log',
-        'scpu-20250208.log',
-        'scpu-20250209.log',
-        'scpu-20250210.log',
-        'scpu-20250211.log',
-        'scpu-20250212.log',
-        'scpu-20250213.log',
-        'scpu-20250214.log',
-        'scpu-20250215.log',
-        'scpu-20250216.log',
-        'scpu-20250217.log',
-        'scpu-20250218.log',
-        'scpu-20250219.log',
-        'scpu-20250220.log',
-        'scpu-20250221.log',
-        'scpu-20250222.log',
-        'scpu-20250223.log',
-        'scpu-20250224.log',
-        'scpu-20250225.log',
-        'scpu-20250226.log',
-        'scpu-20250227.log',
-        'scpu-20250228.log',
-        'scpu.log',
-        'scpu-20250710.log'
+    stages = []
+    if filtered_csv is None:
+        filtered_csv = f"{base}_filtered.csv"
+        # incremental: a stale filter stage only filters what was appended (or rotated) since the last run
+        stages += [
+            Stage('filter', extract_and_filter_logs, (logfiles,),
+                  {'output_csv': filtered_csv, 'incremental': True},
+                  inputs=logfiles, outputs=[filtered_csv], options={'workers': workers}),
+            # incremental: only the rows the filter stage appended are parsed into the dataset
+            Stage('dataset', extract_transition_dataset, (filtered_csv, dataset_dir), {'incremental': True},
+                  inputs=[filtered_csv], outputs=[dataset_dir]),
+            Stage('reshape', reshape_dataset_to_table, (dataset_dir, transitions_csv),
+                  inputs=[dataset_dir], outputs=[transitions_csv]),
+        ]
+    else:
+        stages.append(Stage('reshape', reshape_log_to_table, (filtered_csv, transitions_csv),
+                            inputs=[filtered_csv], outputs=[transitions_csv]))
+    stages += [
+        Stage('deltas', compute_transition_deltas, (transitions_csv, deltas_csv),
+              inputs=[transitions_csv], outputs=[deltas_csv]),
+        Stage('latency', compute_latency_matrix, (transitions_csv, latency_csv),
+              inputs=[transitions_csv], outputs=[latency_csv]),
+        Stage('histogram', plot_histograms, (deltas_csv, histogram_png),
+              inputs=[deltas_csv], outputs=[histogram_png]),
+        Stage('timeline', plot_access_granted_timeline, (transitions_csv, timeline_png),
+              inputs=[transitions_csv], outputs=[timeline_png]),
     ]
+    return stages
 
-    # Prepend 'raw logs/' to each filename
-    logfiles = [os.path.join('raw logs', f) for f in logfiles]
+def run_combined_pipeline(filtered_csv, base='all_logs', in_memory=False, write_csv=False):
+    """
+    Runs reshape to timeline on an existing filtered log CSV. By default these are the
+    run_stages stages of pipeline_stages, so only the stale ones run. in_memory=True runs every
+    stage on DataFrames handed from one stage to the next (the cycle table keeps its times
+    typed), writing the intermediate CSVs only with write_csv=True.
+    """
+    transitions_csv = f"{base}_parsed_transitions.csv"
+    deltas_csv = f"{base}_transition_deltas.csv"
+    latency_csv = f"{base}_latency_matrix.csv"
+    histogram_png = f"{base}_histogram.png"
+    timeline_png = f"{base}_access_granted_timeline.png"
 
-    # filtered_csv = extract_and_filter_logs(logfiles, output_csv='all_logs_filtered.csv')
+    if in_memory:
+        transitions = reshape_log_to_table(filtered_csv, output_csv=None)
+        deltas = transition_deltas(transitions)
+        if write_csv:
+            cycle_table_text(transitions).to_csv(transitions_csv, index=False)
+            deltas.to_csv(deltas_csv, index=False)
+            latency_matrix(transitions).to_csv(latency_csv, index=False)
+        plot_histograms(deltas, png_out=histogram_png)
+        plot_access_granted_timeline(transitions, png_out=timeline_png)
+        return
 
-    filtered_csv = 'all_logs_filtered.csv'
+    run_stages(pipeline_stages([], base=base, filtered_csv=filtered_csv))
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Run the pipeline stages whose inputs, parameters or code changed since their last run.")
+    arg_parser.add_argument('targets', nargs='*', help="stages to bring up to date (default all): "
+                            "filter, dataset, reshape, deltas, latency, histogram, timeline")
+    arg_parser.add_argument('--base', default='all_logs', help="prefix of the output files")
+    arg_parser.add_argument('--filtered', help="start from this filtered log CSV instead of the raw logs")
+    arg_parser.add_argument('--force', action='append', default=[], help="re-run this stage even if cached ('all' for every stage)")
+    arg_parser.add_argument('--jobs', type=int, help="stages run side by side (default: CPU count)")
+    arg_parser.add_argument('--list', action='store_true', help="list the stages and exit")
+    arg_parser.add_argument('--in-memory', action='store_true',
+                            help="run reshape to timeline on DataFrames from --filtered (or <base>_filtered.csv), without the cache")
+    args = arg_parser.parse_args()
 
-    run_combined_pipeline(filtered_csv, base='all_logs')
+    # Plots are only saved; plt.show() must not block a batch run or its worker processes
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
 
+    if args.in_memory:
+        run_combined_pipeline(args.filtered or f"{args.base}_filtered.csv", base=args.base, in_memory=True)
+    else:
+        # Nightly refresh: python main.py (only the stale stages run, the filter stage incrementally)
+        # reshape_dataset_to_table('all_logs_transitions', output_csv, days=[...]) reads only those days of the dataset
+        stages = pipeline_stages([os.path.join('raw logs', f) for f in LOGFILES], base=args.base, filtered_csv=args.filtered)
+        if args.list:
+            for stage in stages:
+                print(f"{stage.name}: {', '.join(stage.inputs[:3])}{' ...' if len(stage.inputs) > 3 else ''} -> {', '.join(stage.outputs)}")
+        else:
+            run_stages(stages, targets=args.targets, force=args.force, jobs=args.jobs)
@@ -1,122 +1,208 @@
 import re
+import numpy as np
 import pandas as pd
-from dateutil import parser
+
+from log_reader import open_log
+from log_time import parse_timestamps, format_timestamps, utc_datetime64
+
+LOG_PATTERN = re.compile(
+    r'^"?'  # Optional starting quote
+    r'(?P<timestamp>[\d\-:T\.]+[+-]\d{2}:\d{2}) .*?'
+    r'((Driveway (?P<driveway>\d+), Zone (?P<zone>\d+), Cell (?P<cell>\d+))'
+    r'|(Aisle (?P<aisle>\d+), Zone (?P<azone>\d+))'
+    r'|(Level (?P<level>\d+))) '
+    r'transitioned from (?P<from_state>\w+) to (?P<to_state>[\w_]+)'
+    r'"?$'   # Optional ending quote
+)
+
+TRANSITIONS_OF_INTEREST = [
+    "ACCESS_GRANTED_EMPTY to GATE_CLOSED",
+    "ACCESS_GRANTED_EMPTY to OPEN",
+    "ACCESS_GRANTED_EMPTY to REQUESTED",
+    "BYPASSED to OPEN",
+    "BYPASSED to REQUESTED",
+    "CLOSED to ACCESS_GRANTED_EMPTY",
+    "CLOSED to CLOSED_EMPTY",
+    "CLOSED to OPEN",
+    "CLOSED to PREPARING",
+    "CLOSED_EMPTY to ACCESS_GRANTED_EMPTY",
+    "CLOSED_EMPTY to OPEN",
+    "GATE_CLOSED to OPEN",
+    "OPEN to BYPASSED",
+    "OPEN to GATE_CLOSED",
+    "OPEN to REQUESTED",
+    "PREPARING to SAFE_ACCESS_GRANTED",
+    "REQUESTED to ACCESS_GRANTED_EMPTY",
+    "REQUESTED to BYPASSED",
+    "REQUESTED to CLOSED",
+    "REQUESTED to CLOSED_EMPTY",
+    "REQUESTED to OPEN",
+    "SAFE_ACCESS_GRANTED to OPEN",
+
+    "SAFE_ACCESS_GRANTED to REQUESTED",
+    "SAFE_ACCESS_GRANTED to GATE_CLOSED",
+    "OPEN to CLOSED",
+    "CLOSED to SAFE_ACCESS_GRANTED",
+    "PREPARING to OPEN",
+    "PREPARING to GATE_CLOSED",
+    "PREPARING to REQUESTED",
+    "CLOSED to GATE_CLOSED",
+    "CLOSED to REQUESTED",
+
+    "OPEN to PREPARING"
+
+    # Not all transitions are shown on the state machine diagram
+]
+
+
+def parse_transition(line):
+    """
+    Parses one LockedSetSafeAccessState line (raw or a filtered CSV row).
+    Returns (timestamp string, location, "FROM to TO") or None.
+    """
+    m = LOG_PATTERN.search(line)
+    if m:
+        timestamp = m.group('timestamp')
+        if m.group('driveway'):
+            location = f"Driveway {m.group('driveway')}, Zone {m.group('zone')}, Cell {m.group('cell')}"
+        elif m.group('aisle'):
+            location = f"Aisle {m.group('aisle')}, Zone {m.group('azone')}"
+        elif m.group('level'):
+            location = f"Level {m.group('level')}"
+        else:
+            return None
+        from_state = m.group('from_state')
+        to_state = m.group('to_state')
+        return timestamp, location, f"{from_state} to {to_state}"
+    return None
+
+
+def cycle_start_transition(location):
+    # A Level cycle starts when it closes; Driveway/Aisle cycles start with the access request
+    if location.startswith("Level"):
+        return "OPEN to CLOSED"
+    return "OPEN to REQUESTED"
+
+
+def offset_column(column):
+    """Column of a typed cycle table holding the UTC offsets (minutes) of a time column."""
+    return f"{column} offset"
+
+
+def time_columns(df):
+    """The time columns of a cycle table, text or typed: Cycle Start and the transitions."""
+    return [col for col in df.columns if col != 'Location' and not col.endswith(' offset')]
+
+
+def build_cycle_table(df, typed=False):
+    """
+    One row per access cycle from a frame of (location, timestamp, offset, transition) rows,
+    timestamps being UTC epoch ns and offsets the minutes they were logged with (parse_timestamps).
+    Cells come out as ISO strings in their original offset. A cycle runs from a cycle-start transition up to the next one at the same location, and each
+    transition column holds the first time that transition occurs inside the cycle.
+    typed=True returns the times as datetime64[ns] UTC instead, each followed at the end of the
+    table by its offset_column (int16 minutes); cycle_table_text turns that back into the text table.
+
+    Sort-once engine: rows are ordered by (location, timestamp) a single time, and every row gets
+    the id of the last cycle start at its location whose timestamp is <= its own, via a running
+    count of start markers read at the end of each run of equal timestamps. That is exactly the
+    [start, next start) window of the original per-cycle search; the first time per
+    (cycle, transition) then comes from one groupby.
+    """
+    columns = ['Location', 'Cycle Start'] + [t for t in TRANSITIONS_OF_INTEREST]
+    if typed:
+        columns += [offset_column(col) for col in columns[1:]]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Locations keep their order of first appearance, cycles their time order
+    locations = pd.Categorical(df['location'], categories=np.asarray(df['location'].unique()))
+    df = pd.DataFrame({'loc': locations.codes, 'timestamp': df['timestamp'].to_numpy(),
+                       'offset': df['offset'].to_numpy(), 'transition': df['transition'].to_numpy()})
+    df = df.sort_values(['loc', 'timestamp'], kind='stable').reset_index(drop=True)
+
+    codes = df['loc'].to_numpy()
+    ts = df['timestamp'].to_numpy()
+    start_of_loc = np.array([cycle_start_transition(loc) for loc in locations.categories], dtype=object)
+    is_start = df['transition'].to_numpy() == start_of_loc[codes]
+    starts_so_far = np.cumsum(is_start)
+
+    n = len(df)
+    new_loc = np.ones(n, dtype=bool)
+    new_loc[1:] = codes[1:] != codes[:-1]
+    new_run = new_loc.copy()
+    new_run[1:] |= ts[1:] != ts[:-1]
+    run_id = np.cumsum(new_run) - 1
+    run_end = np.append(np.flatnonzero(new_run)[1:] - 1, n - 1)
+    cycle = starts_so_far[run_end[run_id]]
+    # cycle ids handed out before each location's block: rows before its first start have none
+    loc_id = np.cumsum(new_loc) - 1
+    cycles_before_loc = (starts_so_far - is_start)[np.flatnonzero(new_loc)][loc_id]
+    in_cycle = cycle > cycles_before_loc
+
+    if typed:
+        df['time'] = utc_datetime64(ts)
+    else:
+        df['time'] = format_timestamps(ts, df['offset'].to_numpy())
+    start_rows = np.flatnonzero(is_start)
+    output_df = pd.DataFrame({'Location': locations.categories[codes[start_rows]],
+                              'Cycle Start': df['time'].iloc[start_rows].to_numpy()},
+                             index=starts_so_far[start_rows])
+
+    # rows are in time order within a cycle, so the first row of a transition is its first time
+    df['cycle'] = cycle
+    of_interest = df[in_cycle & df['transition'].isin(TRANSITIONS_OF_INTEREST).to_numpy()]
+    first = of_interest.drop_duplicates(['cycle', 'transition']).set_index(['cycle', 'transition'])
+    first_times = first['time'].unstack().reindex(columns=TRANSITIONS_OF_INTEREST)
+    if typed:
+        output_df[offset_column('Cycle Start')] = df['offset'].iloc[start_rows].to_numpy()
+        first_offsets = first['offset'].unstack().reindex(columns=TRANSITIONS_OF_INTEREST).fillna(0)
+        first_times = first_times.astype('M8[ns]').join(
+            first_offsets.astype(np.int16).rename(columns=offset_column))
+    output_df = output_df.join(first_times)
+    return output_df[columns].reset_index(drop=True)
+
+
+def cycle_table_text(df):
+    """The text table (ISO strings in their original offset) of a typed cycle table."""
+    output_df = df[['Location']].copy()
+    for col in time_columns(df):
+        output_df[col] = format_timestamps(df[col].to_numpy(dtype='M8[ns]').view(np.int64),
+                                           df[offset_column(col)].to_numpy())
+    return output_df
+
 
 def reshape_log_to_table(filtered_csv, output_csv='parsed_transitions.csv'):
+    """
+    Writes the cycle table of a filtered log to output_csv and returns its path; with
+    output_csv=None nothing is written and the typed cycle table is returned instead.
+    """
     # --- Load and Parse ---
 
-    with open(filtered_csv, encoding='utf-8') as f:
+    with open_log(filtered_csv, 'rt') as f:
         lines = f.readlines()
     if lines[0].strip().lower().startswith("log entry"):
         lines = lines[1:]
 
-    log_pattern = re.compile(
-        r'^"?'  # Optional starting quote
-        r'(?P<timestamp>[\d\-:T\.]+[+-]\d{2}:\d{2}) .*?'
-        r'((Driveway (?P<driveway>\d+), Zone (?P<zone>\d+), Cell (?P<cell>\d+))'
-        r'|(Aisle (?P<aisle>\d+), Zone (?P<azone>\d+))'
-        r'|(Level (?P<level>\d+))) '
-        r'transitioned from (?P<from_state>\w+) to (?P<to_state>[\w_]+)'
-        r'"?$'   # Optional ending quote
-    )
-
-
     entries = []
     for line in lines:
-        m = log_pattern.search(line)
-        if m:
-            timestamp = m.group('timestamp')
-            if m.group('driveway'):
-                location = f"Driveway {m.group('driveway')}, Zone {m.group('zone')}, Cell {m.group('cell')}"
-            elif m.group('aisle'):
-                location = f"Aisle {m.group('aisle')}, Zone {m.group('azone')}"
-            elif m.group('level'):
-                location = f"Level {m.group('level')}"
-            else:
-                continue
-            from_state = m.group('from_state')
-            to_state = m.group('to_state')
-            transition = f"{from_state} to {to_state}"
+        parsed = parse_transition(line)
+        if parsed:
+            timestamp, location, transition = parsed
             entries.append({
                 'location': location,
                 'timestamp': timestamp,
                 'transition': transition
             })
 
-    df = pd.DataFrame(entries)
-    df['timestamp'] = df['timestamp'].apply(lambda x: parser.parse(x).replace(tzinfo=None))
-
-    # --- Main logic: Per-cycle search ---
-
-    transitions_of_interest = [
-        "ACCESS_GRANTED_EMPTY to GATE_CLOSED",
-        "ACCESS_GRANTED_EMPTY to OPEN",
-        "ACCESS_GRANTED_EMPTY to REQUESTED",
-        "BYPASSED to OPEN",
-        "BYPASSED to REQUESTED",
-        "CLOSED to ACCESS_GRANTED_EMPTY",
-        "CLOSED to CLOSED_EMPTY",
-        "CLOSED to OPEN",
-        "CLOSED to PREPARING",
-        "CLOSED_EMPTY to ACCESS_GRANTED_EMPTY",
-        "CLOSED_EMPTY to OPEN",
-        "GATE_CLOSED to OPEN",
-        "OPEN to BYPASSED",
-        "OPEN to GATE_CLOSED",
-        "OPEN to REQUESTED",
-        "PREPARING to SAFE_ACCESS_GRANTED",
-        "REQUESTED to ACCESS_GRANTED_EMPTY",
-        "REQUESTED to BYPASSED",
-        "REQUESTED to CLOSED",
-        "REQUESTED to CLOSED_EMPTY",
-        "REQUESTED to OPEN",
-        "SAFE_ACCESS_GRANTED to OPEN",
-
-        "SAFE_ACCESS_GRANTED to REQUESTED",
-        "SAFE_ACCESS_GRANTED to GATE_CLOSED",
-        "OPEN to CLOSED",
-        "CLOSED to SAFE_ACCESS_GRANTED",
-        "PREPARING to OPEN",
-        "PREPARING to GATE_CLOSED",
-        "PREPARING to REQUESTED",
-        "CLOSED to GATE_CLOSED",
-        "CLOSED to REQUESTED",
-
-        "OPEN to PREPARING"
-    
-        # Not all transitions are shown on the state machine diagram
-    ]
-
-    output_rows = []
-    for location in df['location'].unique():
-        df_loc = df[df['location'] == location].sort_values('timestamp')
-        # Determine cycle start transition
-        if location.startswith("Level"):
-            cycle_start = "OPEN to CLOSED"
-        else:
-            cycle_start = "OPEN to REQUESTED"
-
-        # Find indices of all cycle starts
-        cycle_start_idx = df_loc.index[df_loc['transition'] == cycle_start].tolist()
-        # For each cycle window...
-        for i, idx in enumerate(cycle_start_idx):
-            start_time = df_loc.loc[idx, 'timestamp']
-            if i + 1 < len(cycle_start_idx):
-                end_time = df_loc.loc[cycle_start_idx[i + 1], 'timestamp']
-                df_window = df_loc[(df_loc['timestamp'] >= start_time) & (df_loc['timestamp'] < end_time)]
-            else:
-                df_window = df_loc[df_loc['timestamp'] >= start_time]
-
-            row = {'Location': location, 'Cycle Start': start_time}
-            for transition in transitions_of_interest:
-                t_row = df_window[df_window['transition'] == transition]
-                row[transition] = t_row['timestamp'].iloc[0] if not t_row.empty else None
-            output_rows.append(row)
-
-    output_df = pd.DataFrame(output_rows)
-    columns = ['Location', 'Cycle Start'] + [t for t in transitions_of_interest]
-    output_df = output_df[[col for col in columns if col in output_df.columns]]
+    df = pd.DataFrame(entries, columns=['location', 'timestamp', 'transition'])
+    df['timestamp'], df['offset'] = parse_timestamps(df['timestamp'])
+
+    # --- Main logic: cycle table ---
+
+    if output_csv is None:
+        return build_cycle_table(df, typed=True)
+    output_df = build_cycle_table(df)
 
     output_df.to_csv(output_csv, index=False)
     return output_csv
-    print(output_df.head())
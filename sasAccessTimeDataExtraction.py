@@ -1,40 +1,240 @@
 import csv
-import re
+import mmap
 import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_and_filter_logs(log_files, output_csv='filtered_log_transitionStates.csv'):
+from log_reader import open_log, is_compressed
+from log_filter import get_matcher
+from log_index import window_offsets, in_window, to_epoch
+from extraction_manifest import load_manifest, save_manifest, resume_offset, consumable_end, file_entry
+from stage_cache import source_version
+
+INCLUDE_KEYWORDS = [
+    "LockedSetSafetyIOContext",
+    "LockedSetSafeAccessState"
+]
+EXCLUDE_PHRASES = [
+    # "Driveway",
+    # "Level",
+    # "Aisle",
+    "bot id requested", "requested to renew lease",
+    "Accountant requested codeplate", "Vendor-Class-ID requested", "Options requested",
+    "SafetyTimeManager", "_botLift_", "Botlift", "Unsafe level", "Unsafe cell"
+]
+
+# The code deciding which rows the filtered CSV holds; an incremental run keeps them only while it is unchanged
+FILTER_MODULES = ('sasAccessTimeDataExtraction', 'log_filter', 'log_reader', 'log_index', 'extraction_manifest')
+
+# Large files are split into chunks of about this many bytes, each filtered by its own worker
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+# 'mmap' scans raw bytes for the keywords and decodes only matching lines; 'lines' decodes every line
+DEFAULT_BACKEND = 'mmap'
+# Decompressed block size scanned at a time by the 'mmap' backend for .gz/.xz logs
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def chunk_offsets(log_file, chunk_size=DEFAULT_CHUNK_SIZE, start=0, end=None):
+    """
+    Splits bytes [start, end) of a file into ranges of about chunk_size bytes.
+    Every boundary is moved forward to just after a newline, so no line is cut in two.
+    Compressed logs cannot be entered mid-stream and come back as a single (start, end) range.
+    """
+    if is_compressed(log_file):
+        return [(start, end)]
+    size = os.path.getsize(log_file) if end is None else end
+    offsets = [start]
+    with open(log_file, 'rb') as f:
+        while offsets[-1] + chunk_size < size:
+            f.seek(offsets[-1] + chunk_size)
+            f.readline()
+            if f.tell() >= size:
+                break
+            offsets.append(f.tell())
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def iter_log_lines(log_file, start, end, stats):
+    """'lines' backend: yields every raw line in bytes [start, end); stats['bytes'] counts bytes read."""
+    pos = start
+    with open_log(log_file) as f:
+        if start:
+            f.seek(start)
+        for raw in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(raw)
+            stats['bytes'] = pos - start
+            yield raw
+
+
+def scan_log_lines(log_file, start, end, matcher, stats):
+    """
+    'mmap' backend: yields only the raw lines in bytes [start, end) that contain one of the
+    matcher's anchors. Plain logs are memory-mapped and searched in place; compressed logs are
+    decompressed in large newline-aligned blocks. Nothing else is split into lines or decoded.
+    """
+    if not is_compressed(log_file):
+        end = os.path.getsize(log_file) if end is None else end
+        stats['bytes'] = max(end - start, 0)
+        if end <= start:
+            return
+        with open(log_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield from matcher.scan(buf, start, end)
+        return
+
+    pos = start
+    tail = b''
+    with open_log(log_file) as f:
+        if start:
+            f.seek(start)
+        while end is None or pos < end:
+            block = f.read(SCAN_BLOCK_SIZE if end is None else min(SCAN_BLOCK_SIZE, end - pos))
+            if not block:
+                break
+            pos += len(block)
+            stats['bytes'] = pos - start
+            buf = tail + block
+            cut = buf.rfind(b'\n') + 1
+            yield from matcher.scan(buf, 0, cut)
+            tail = buf[cut:]
+    if tail:
+        yield from matcher.scan(tail)
+
+
+def filtered_lines(log_file, start, end, matcher, stats, since=None, until=None, backend=DEFAULT_BACKEND):
+    """
+    Yields the cleaned lines in bytes [start, end) of a log file that the matcher keeps and that
+    fall in the since/until window (epoch seconds); stats['bytes'] counts bytes read.
+    """
+    if backend == 'mmap':
+        raw_lines = scan_log_lines(log_file, start, end, matcher, stats)
+    else:
+        raw_lines = iter_log_lines(log_file, start, end, stats)
+    for raw in raw_lines:
+        line = raw.decode('utf-8', errors='ignore')
+        if matcher.match(line):
+            if (since is not None or until is not None) and not in_window(line, since, until):
+                continue
+            yield matcher.clean(line)
+
+
+def filter_log_chunk(log_file, start, end, out_path,
+                     include_keywords=tuple(INCLUDE_KEYWORDS), exclude_phrases=tuple(EXCLUDE_PHRASES),
+                     since=None, until=None, backend=DEFAULT_BACKEND):
+    """
+    Filters the lines in bytes [start, end) of a log file and writes them as CSV rows to out_path.
+    end=None reads to the end of the file; .gz/.xz logs are decompressed on the fly.
+    since/until (epoch seconds) drop kept lines timestamped outside the window.
+    backend 'mmap' scans raw bytes and decodes only candidate lines; 'lines' decodes every line.
+    Only the row count travels back to the caller, not the rows themselves.
+    Returns (rows written, bytes read, seconds taken).
+    """
+    matcher = get_matcher(include_keywords, exclude_phrases)
+    t0 = time.perf_counter()
+    count = 0
+    stats = {'bytes': 0}
+    with open(out_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        for line in filtered_lines(log_file, start, end, matcher, stats, since, until, backend):
+            writer.writerow([line])
+            count += 1
+    return count, stats['bytes'], time.perf_counter() - t0
+
+
+def _filter_task(task):
+    return filter_log_chunk(*task)
+
+
+def extract_and_filter_logs(log_files, output_csv='filtered_log_transitionStates.csv', workers=1,
+                            chunk_size=DEFAULT_CHUNK_SIZE, include_keywords=INCLUDE_KEYWORDS,
+                            exclude_phrases=EXCLUDE_PHRASES, since=None, until=None, incremental=False,
+                            backend=DEFAULT_BACKEND):
     """
     Takes a list of log file paths and writes a single filtered CSV.
+    Each file is split at newline-aligned offsets into chunks of about chunk_size bytes.
+    With workers > 1 the chunks are filtered in a process pool, each worker writing its rows
+    to a temp file; the temp files are joined in input order, so the CSV is identical to the serial run.
+    since/until (datetime, ISO string or epoch seconds) keep only lines in that time window;
+    the sidecar time index (log_index.py) is used to read just that part of each file.
+    With incremental=True a manifest next to output_csv records how far each file was read:
+    unchanged files are skipped, grown or rotated files only have their new lines filtered,
+    and those rows are appended to the existing CSV. A manifest written by another version of
+    the filtering code (FILTER_MODULES) is discarded and the CSV rebuilt from scratch.
+    backend selects how lines are read, see filter_log_chunk.
     """
-    include_keywords = [
-        "LockedSetSafetyIOContext",
-        "LockedSetSafeAccessState"
-    ]
-    exclude_phrases = [
-        # "Driveway",
-        # "Level", 
-        # "Aisle", 
-        "bot id requested", "requested to renew lease",
-        "Accountant requested codeplate", "Vendor-Class-ID requested", "Options requested",
-        "SafetyTimeManager", "_botLift_", "Botlift", "Unsafe level", "Unsafe cell"
-    ]
-
-    include_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in include_keywords) + r')\b', re.IGNORECASE)
-    exclude_pattern = re.compile(r'|'.join(re.escape(p) for p in exclude_phrases), re.IGNORECASE)
-
-    filtered_lines = []
-    for log_file in log_files:
-        with open(log_file, 'r') as f:
-            for line in f:
-                line_lower = line.lower()
-                if include_pattern.search(line) and not exclude_pattern.search(line_lower):
-                    cleaned_line = re.sub(r'(\bbotguardian\d+)\.mservices\.[^\s]+', r'\1', line.strip())
-                    filtered_lines.append([cleaned_line])
-        print(f"Filtered log written from {log_file}")
-
-    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Log Entry'])
-        writer.writerows(filtered_lines)
-    print(f"Filtered log written to {output_csv} ({len(filtered_lines)} lines)")
+    include_keywords = tuple(include_keywords)
+    exclude_phrases = tuple(exclude_phrases)
+    since, until = to_epoch(since), to_epoch(until)
+    if incremental and (since is not None or until is not None):
+        raise ValueError("incremental extraction cannot be combined with since/until")
+    out_dir = os.path.dirname(os.path.abspath(output_csv))
+    total_lines = 0
+
+    code = source_version(FILTER_MODULES)
+    manifest = load_manifest(output_csv, include_keywords, exclude_phrases, code) if incremental else None
+    previous_files = manifest['files'] if manifest else {}
+
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp_dir:
+        tasks = []
+        task_files = []
+        file_ends = {}
+        skipped = set()
+        for i, log_file in enumerate(log_files):
+            if incremental:
+                window_start, unchanged = resume_offset(log_file, previous_files)
+                window_end = None if is_compressed(log_file) else consumable_end(log_file)
+                if unchanged:
+                    skipped.add(i)
+                    file_ends[i] = window_start
+                    continue
+            else:
+                window_start, window_end = window_offsets(log_file, since, until)
+            file_ends[i] = window_end if window_end is not None else window_start
+            for j, (start, end) in enumerate(chunk_offsets(log_file, chunk_size, window_start, window_end)):
+                part = os.path.join(tmp_dir, f'{i:05d}_{j:05d}.csv')
+                tasks.append((log_file, start, end, part, include_keywords, exclude_phrases, since, until, backend))
+                task_files.append(i)
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_filter_task, tasks))
+        else:
+            results = list(map(_filter_task, tasks))
+
+        append = manifest is not None
+        with open(output_csv, 'a' if append else 'w', newline='', encoding='utf-8') as f:
+            if not append:
+                writer = csv.writer(f)
+                writer.writerow(['Log Entry'])
+            for task in tasks:
+                with open(task[3], 'r', newline='', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, f)
+
+    for i, log_file in enumerate(log_files):
+        if i in skipped:
+            print(f"Skipped {log_file} (unchanged since last run)")
+            continue
+        file_results = [r for r, file_index in zip(results, task_files) if file_index == i]
+        lines = sum(r[0] for r in file_results)
+        size = sum(r[1] for r in file_results)
+        elapsed = sum(r[2] for r in file_results)
+        total_lines += lines
+        if is_compressed(log_file):
+            file_ends[i] += size
+        mb_per_s = size / 1e6 / elapsed if elapsed > 0 else float('inf')
+        print(f"Filtered log written from {log_file} ({len(file_results)} chunks, {lines} lines, {size / 1e6:.1f} MB in {elapsed:.2f}s, {mb_per_s:.1f} MB/s)")
+
+    if incremental:
+        files = dict(previous_files)
+        for i, log_file in enumerate(log_files):
+            files[log_file] = file_entry(log_file, file_ends[i])
+        save_manifest(output_csv, {'include_keywords': list(include_keywords),
+                                   'exclude_phrases': list(exclude_phrases), 'code': code, 'files': files})
+
+    print(f"Filtered log written to {output_csv} ({total_lines} {'new ' if manifest else ''}lines)")
     return output_csv
@@ -0,0 +1,151 @@
+import argparse
+import re
+
+from log_filter import get_matcher
+from log_index import window_offsets, to_epoch
+from log_time import parse_timestamp, to_datetime
+from sasAccessTimeDataExtraction import filtered_lines, DEFAULT_BACKEND
+from snapshot_store import SNAPSHOT_TAGS, EVENT_EDGES, is_edge, tag_positions, snapshot_text, write_event_timing
+
+# Method 1 (snapshots) in one pass: the filter of 1_intermediate_filter_log_entries.py, the
+# transition gating of 2_detect_transitions.py and the timings of 3_timeElapsed.py, without
+# writing intermediate_filtered_log.csv or filtered_log_transitions.csv
+
+SNAPSHOT_EXCLUDE_PHRASES = [
+    "bot id requested", "requested to renew lease",
+    "Accountant requested codeplate", "Vendor-Class-ID requested", "Options requested",
+    "SafetyTimeManager", "_botLift_", "Botlift", "Unsafe level", "Unsafe cell"
+]
+
+# Zone-type definitions: (label, req keyword, door keyword, state keyword)
+SNAPSHOT_ZONE_TYPES = [
+    ('Z1_aisle', 'Z1 aisle req', 'Z1 aisle key', None),
+    ('Z2_aisle', 'Z2 aisle req', 'Z2 aisle key', None),
+    ('Z3_aisle', 'Z3 aisle req', 'Z3 aisle key', None),
+    ('Z1_dwy', 'Z1 dwy req', 'Z1 dwy door', 'Z1 dwy state'),
+    ('Z2_dwy', 'Z2 dwy req', 'Z2 dwy door', 'Z2 dwy state'),
+    ('Z3_dwy', 'Z3 dwy req', 'Z3 dwy door', 'Z3 dwy state'),
+    ('level', 'level req', 'level key', None),
+]
+
+# Dispatch: one regex finds every tag in a line, each tag maps to its zone type
+TAG_PATTERN = re.compile('|'.join(re.escape(tag) for tag in sorted(SNAPSHOT_TAGS, key=len, reverse=True)))
+TAG_ZONE_TYPE = {tag: i for i, zone_type in enumerate(SNAPSHOT_ZONE_TYPES) for tag in zone_type[1:] if tag}
+REQ_PATTERNS = {req_tag: re.compile(rf'{re.escape(req_tag)}\s+(.*)') for _, req_tag, _, _ in SNAPSHOT_ZONE_TYPES}
+
+
+class TransitionGate:
+    """
+    2_detect_transitions.py one line at a time. A zone type's first request line is kept, then
+    each request line whose bits changed to a new request once an all-zero request was seen;
+    such a line arms the capture of the next door and state line of the same zone type.
+    """
+
+    def __init__(self):
+        self.prev_req_bits = {}
+        self.has_seen_valid_zero = set()
+        self.capture_next_door = set()
+        self.capture_next_state = set()
+
+    def keep(self, line, tags):
+        """Whether the line, holding the given snapshot tags, is a transition line."""
+        kept = False
+        for i in sorted({TAG_ZONE_TYPE[tag] for tag in tags}):
+            label, req_tag, door_tag, state_tag = SNAPSHOT_ZONE_TYPES[i]
+            if req_tag in tags:
+                match = REQ_PATTERNS[req_tag].search(line)
+                if not match:
+                    continue
+                bit_string = match.group(1).replace(' ', '')
+                if label not in self.prev_req_bits:
+                    kept = True
+                    self.prev_req_bits[label] = bit_string
+                    if '1' not in bit_string:
+                        self.has_seen_valid_zero.add(label)
+                    continue
+                if bit_string != self.prev_req_bits[label]:
+                    if label in self.has_seen_valid_zero and '1' in bit_string:
+                        kept = True
+                        if door_tag:
+                            self.capture_next_door.add(label)
+                        if state_tag:
+                            self.capture_next_state.add(label)
+                    if '1' not in bit_string:
+                        self.has_seen_valid_zero.add(label)
+                    self.prev_req_bits[label] = bit_string
+            elif door_tag in tags and label in self.capture_next_door:
+                kept = True
+                self.capture_next_door.discard(label)
+            elif state_tag in tags and label in self.capture_next_state:
+                kept = True
+                self.capture_next_state.discard(label)
+        return kept
+
+
+class EdgeTracker:
+    """
+    3_timeElapsed.py one transition line at a time: keeps each tag's previous snapshot and the
+    time of the last EVENT_EDGES edge of every position.
+    """
+
+    def __init__(self):
+        self.previous = {}
+        self.edge_times = {tag: {} for tag in EVENT_EDGES}
+
+    def add(self, line, tags):
+        timestamp = None
+        for tag in tags:
+            if tag == 'level key' and 'level req' in tags:
+                continue
+            chars = snapshot_text(line, tag)[:tag_positions(tag)]
+            previous = self.previous.get(tag)
+            if previous:
+                edge = EVENT_EDGES[tag]
+                for i, (before, after) in enumerate(zip(previous, chars)):
+                    if is_edge(edge, before, after):
+                        if timestamp is None:
+                            timestamp = parse_timestamp(line)
+                        self.edge_times[tag][i] = timestamp
+            self.previous[tag] = chars
+
+    def event_times(self):
+        """{tag: {position: aware datetime}}, as write_event_timing takes it."""
+        return {tag: {i: to_datetime(*t) for i, t in times.items()} for tag, times in self.edge_times.items()}
+
+
+def snapshot_event_timing(log_files, output_csv='event_timing.csv', since=None, until=None,
+                          exclude_phrases=SNAPSHOT_EXCLUDE_PHRASES, backend=DEFAULT_BACKEND):
+    """
+    Writes event_timing.csv straight from raw scpu logs (read once, in order, .gz/.xz included).
+    since/until (datetime, ISO string or epoch seconds) and backend are as in extract_and_filter_logs.
+    """
+    matcher = get_matcher(tuple(SNAPSHOT_TAGS), tuple(exclude_phrases))
+    since, until = to_epoch(since), to_epoch(until)
+    gate = TransitionGate()
+    tracker = EdgeTracker()
+    total_lines = transition_lines = 0
+    for log_file in log_files:
+        start, end = window_offsets(log_file, since, until)
+        stats = {'bytes': 0}
+        for line in filtered_lines(log_file, start, end, matcher, stats, since, until, backend):
+            total_lines += 1
+            tags = set(TAG_PATTERN.findall(line))
+            if tags and gate.keep(line, tags):
+                transition_lines += 1
+                tracker.add(line, tags)
+        print(f"Read {log_file} ({stats['bytes'] / 1e6:.1f} MB)")
+
+    write_event_timing(output_csv, tracker.event_times())
+    print(f"{total_lines} snapshot lines, {transition_lines} transitions; results written to {output_csv}")
+    return output_csv
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Snapshot method (steps 1-3) in one pass over raw scpu logs.")
+    arg_parser.add_argument('log_files', nargs='+')
+    arg_parser.add_argument('--output', default='event_timing.csv')
+    arg_parser.add_argument('--since', help="e.g. 2025-07-10T14:00:00-04:00")
+    arg_parser.add_argument('--until')
+    arg_parser.add_argument('--backend', choices=('mmap', 'lines'), default=DEFAULT_BACKEND)
+    args = arg_parser.parse_args()
+    snapshot_event_timing(args.log_files, args.output, args.since, args.until, backend=args.backend)
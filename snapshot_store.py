@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from log_reader import open_log
+from log_time import parse_timestamps
+
+# _siomon_ snapshot tags; each line holds one tag followed by one character per position
+SNAPSHOT_TAGS = [f"{zone} {tag}" for zone in ('Z1', 'Z2', 'Z3')
+                 for tag in ('aisle req', 'aisle key', 'dwy req', 'dwy door', 'dwy state')] + ['level req', 'level key']
+
+# Value of a position past the end of a shorter snapshot line
+PAD = 0
+
+# Snapshot edges, as (character before, character after); None = any other character
+RISING = ('0', '1')
+FALLING = ('1', '0')
+CLOSED = (None, 'C')
+
+# Edge timed per tag in event_timing.csv: request start, door/key release and driveway state closed
+EVENT_EDGES = {}
+for _zone in ('Z1', 'Z2', 'Z3'):
+    EVENT_EDGES.update({f"{_zone} dwy req": RISING, f"{_zone} dwy door": FALLING, f"{_zone} dwy state": CLOSED,
+                        f"{_zone} aisle req": RISING, f"{_zone} aisle key": FALLING})
+EVENT_EDGES.update({'level req': RISING, 'level key': FALLING})
+
+# level req/key lines end in extra bits (e.g. "1 0"); only the first LEVEL_POSITIONS are levels
+LEVEL_POSITIONS = 10
+
+
+def store_path(filtered_csv):
+    return filtered_csv + '.snapshots'
+
+
+def _tag_file(store_dir, tag, name):
+    return os.path.join(store_dir, f"{tag.replace(' ', '_')}.{name}.npy")
+
+
+class SnapshotTag:
+    """
+    Every snapshot of one tag as a time x position uint8 matrix of the logged characters
+    (b'0'/b'1' bits, or state letters), with parallel int64 UTC ns times and offsets, rows in log order.
+    """
+
+    def __init__(self, times, offsets, values):
+        self.times = times
+        self.offsets = offsets
+        self.values = values
+
+    def edges(self):
+        """
+        (rising, falling) bit edges between consecutive snapshots, each (rows - 1) x positions,
+        both from one diff of the matrix.
+        """
+        step = np.diff(self.values.astype(np.int16), axis=0)
+        before = self.values[:-1]
+        return (step == 1) & (before == ord('0')), (step == -1) & (before == ord('1'))
+
+    def rising(self):
+        """Bit edges 0 -> 1 between consecutive snapshots."""
+        return self.edges()[0]
+
+    def falling(self):
+        """Bit edges 1 -> 0 between consecutive snapshots."""
+        return self.edges()[1]
+
+    def became(self, char):
+        """Positions switching to char (e.g. b'C') from any other character."""
+        code = ord(char)
+        before, after = self.values[:-1], self.values[1:]
+        return (after == code) & (before != code) & (before != PAD)
+
+    def edge(self, edge):
+        """Edge matrix for one of RISING, FALLING or a (None, char) edge such as CLOSED."""
+        if edge == RISING:
+            return self.rising()
+        if edge == FALLING:
+            return self.falling()
+        return self.became(edge[1])
+
+    def last_edges(self, edges, positions=None):
+        """{position: row} of the last edge per position; row indexes times/offsets."""
+        if positions is not None:
+            edges = edges[:, :positions]
+        if len(edges) == 0:
+            return {}
+        last = len(edges) - np.argmax(edges[::-1], axis=0)
+        return {int(i): int(last[i]) for i in np.flatnonzero(edges.any(axis=0))}
+
+    def at(self, t):
+        """The snapshot in force at UTC ns t (None before the first one); rows must be in time order."""
+        row = np.searchsorted(self.times, t, side='right') - 1
+        return None if row < 0 else self.values[row]
+
+    def occupied_at(self, t):
+        """Bool per position: bit set in the snapshot in force at t."""
+        snapshot = self.at(t)
+        return np.zeros(self.values.shape[1], dtype=bool) if snapshot is None else snapshot == ord('1')
+
+
+def is_edge(edge, before, after):
+    """Single-position form of SnapshotTag.edge, for snapshots fed one line at a time."""
+    if edge[0] is None:
+        return before != edge[1] and after == edge[1]
+    return before == edge[0] and after == edge[1]
+
+
+def tag_positions(tag):
+    """Number of positions of a tag that are timed (None = all)."""
+    return LEVEL_POSITIONS if tag.startswith('level') else None
+
+
+def snapshot_text(line, tag):
+    """The characters after the (last) tag in a snapshot line, with the spaces between groups removed."""
+    return "".join(line.split(tag)[-1].split())
+
+
+def build_snapshot_store(filtered_csv, store_dir=None):
+    """
+    Decodes every snapshot line of a filtered log into one SnapshotTag per tag and saves them
+    as .npy files next to it (times, offsets and values per tag, plus a meta.json written last).
+    """
+    store_dir = store_dir or store_path(filtered_csv)
+    rows = {tag: [] for tag in SNAPSHOT_TAGS}
+    heads = {tag: [] for tag in SNAPSHOT_TAGS}
+    with open_log(filtered_csv, 'rt') as f:
+        for line in f:
+            line = line.strip()
+            for tag in SNAPSHOT_TAGS:
+                if tag in line and not (tag == 'level key' and 'level req' in line):
+                    heads[tag].append(line)
+                    rows[tag].append(snapshot_text(line, tag).encode('ascii', 'replace'))
+
+    os.makedirs(store_dir, exist_ok=True)
+    store = {}
+    for tag in SNAPSHOT_TAGS:
+        width = max((len(r) for r in rows[tag]), default=0)
+        values = np.frombuffer(b''.join(r.ljust(width, bytes([PAD])) for r in rows[tag]), dtype=np.uint8)
+        values = values.reshape(len(rows[tag]), width)
+        times, offsets = parse_timestamps(heads[tag])
+        for name, array in (('times', times), ('offsets', offsets), ('values', values)):
+            path = _tag_file(store_dir, tag, name)
+            with open(path + '.part', 'wb') as out:
+                np.save(out, array)
+            os.replace(path + '.part', path)
+        store[tag] = SnapshotTag(times, offsets, values)
+
+    st = os.stat(filtered_csv)
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+        json.dump({'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns, 'tags': SNAPSHOT_TAGS}, f)
+    return store
+
+
+def load_snapshot_store(filtered_csv, store_dir=None):
+    """
+    {tag: SnapshotTag} with the arrays memory-mapped from the .npy files, rebuilding the
+    store when it is missing or older than the filtered log.
+    """
+    store_dir = store_dir or store_path(filtered_csv)
+    st = os.stat(filtered_csv)
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if (meta['source_size'] != st.st_size or meta['source_mtime_ns'] != st.st_mtime_ns
+                or meta['tags'] != SNAPSHOT_TAGS):
+            return build_snapshot_store(filtered_csv, store_dir)
+        return {tag: SnapshotTag(*(np.load(_tag_file(store_dir, tag, name), mmap_mode='r')
+                                   for name in ('times', 'offsets', 'values')))
+                for tag in SNAPSHOT_TAGS}
+    except (OSError, ValueError, KeyError):
+        return build_snapshot_store(filtered_csv, store_dir)
+
+
+def write_event_timing(output_csv, edge_times):
+    """
+    Writes event_timing.csv from {tag: {position: aware datetime}} of the last EVENT_EDGES edge
+    per position: one row per driveway, level and aisle position with a request start, and the
+    seconds from it to the door/state/key edges of the same position.
+    """
+    def seconds(t, t_req):
+        return (t - t_req).total_seconds() if t else ""
+
+    with open(output_csv, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Type', 'Position', 'Start_Time', 'Req_to_Door_s', 'Req_to_C_s', 'Req_to_Key_s'])
+        for zone in ('Z1', 'Z2', 'Z3'):
+            req_start = edge_times.get(f"{zone} dwy req", {})
+            door_end = edge_times.get(f"{zone} dwy door", {})
+            state_c = edge_times.get(f"{zone} dwy state", {})
+            for i in sorted(req_start):
+                t_req = req_start[i]
+                writer.writerow(['Driveway', f"{zone}-{i+1}", t_req.isoformat() if t_req else "",
+                                 seconds(door_end.get(i), t_req), seconds(state_c.get(i), t_req), ""])
+        level_req_start = edge_times.get('level req', {})
+        level_key_end = edge_times.get('level key', {})
+        for i in sorted(level_req_start):
+            t_req = level_req_start[i]
+            writer.writerow(['Level', f"{i+1}", t_req.isoformat() if t_req else "", "", "",
+                             seconds(level_key_end.get(i), t_req)])
+        for zone in ('Z1', 'Z2', 'Z3'):
+            aisle_req_start = edge_times.get(f"{zone} aisle req", {})
+            aisle_key_end = edge_times.get(f"{zone} aisle key", {})
+            for i in sorted(aisle_req_start):
+                t_req = aisle_req_start[i]
+                writer.writerow(['Aisle', f"{zone}-{i+1}", t_req.isoformat() if t_req else "", "", "",
+                                 seconds(aisle_key_end.get(i), t_req)])
+    return output_csv
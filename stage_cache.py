@@ -0,0 +1,221 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from extraction_manifest import file_fingerprint
+
+# One record per stage: the key its outputs were made with, and their size/mtime
+CACHE_DIR = '.pipeline_cache'
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+    """
+    One step of a pipeline: func(*args, **params, **options) reads the inputs files and writes
+    the outputs files. An input written by another stage makes this stage depend on it.
+    options (e.g. worker counts) are passed on but, unlike params, do not change the cache key.
+    """
+
+    def __init__(self, name, func, args=(), params=None, inputs=(), outputs=(), options=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.params = dict(params or {})
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.options = dict(options or {})
+
+    def run(self):
+        return self.func(*self.args, **self.params, **self.options)
+
+
+def _local_imports(path):
+    """Root-level modules of this repo imported by a source file."""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return {name for name in names if os.path.exists(os.path.join(REPO_DIR, name + '.py'))}
+
+
+_code_versions = {}
+
+
+def source_version(modules):
+    """SHA-1 of the source of the given repo modules (names, e.g. 'log_filter')."""
+    digest = hashlib.sha1()
+    for name in sorted(modules):
+        with open(os.path.join(REPO_DIR, name + '.py'), 'rb') as f:
+            digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def code_version(func):
+    """SHA-1 of the source of func's module and of every repo module it imports, directly or not."""
+    module = func.__module__
+    if module == '__main__':
+        module = os.path.splitext(os.path.basename(sys.modules['__main__'].__file__))[0]
+    if module not in _code_versions:
+        seen, todo = set(), [module]
+        while todo:
+            name = todo.pop()
+            if name not in seen:
+                seen.add(name)
+                todo.extend(_local_imports(os.path.join(REPO_DIR, name + '.py')))
+        _code_versions[module] = source_version(seen)
+    return _code_versions[module]
+
+
+def input_key(path):
+    """
+    Identity of an input no stage writes, e.g. a raw log: size, mtime and a hash of its first
+    bytes (hashing 30 days of raw logs on every run would cost as much as filtering them).
+    """
+    if not os.path.exists(path):
+        return 'missing'
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}:{file_fingerprint(path)[0]}"
+
+
+def _tree_files(path):
+    """The files of an output directory (e.g. a transition dataset), in a stable order."""
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+
+
+def content_key(path, block_size=1024 * 1024):
+    """SHA-1 of a whole file, or of every file of a directory, for the inputs written by other stages."""
+    digest = hashlib.sha1()
+    for file_path in _tree_files(path) if os.path.isdir(path) else [path]:
+        digest.update(os.path.relpath(file_path, path).encode() + b'\0')
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_key(stage, produced=()):
+    """
+    Cache key of a stage: its function, code version, args, params and inputs. Inputs in
+    produced (written by other stages) are keyed by content, so a stage whose upstream re-ran
+    with the same result stays cached.
+    """
+    inputs = [(path, content_key(path) if path in produced else input_key(path)) for path in stage.inputs]
+    description = json.dumps({'stage': stage.name, 'func': f"{stage.func.__module__}.{stage.func.__qualname__}",
+                              'code': code_version(stage.func), 'args': repr(stage.args),
+                              'params': repr(sorted(stage.params.items())), 'inputs': inputs})
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+def _record_path(name, cache_dir):
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def _output_stats(stage):
+    stats = {}
+    for path in stage.outputs:
+        if os.path.isdir(path):
+            stats[path] = [[os.path.relpath(f, path), os.stat(f).st_size, os.stat(f).st_mtime_ns]
+                           for f in _tree_files(path)]
+        else:
+            st = os.stat(path)
+            stats[path] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+def is_cached(stage, key, cache_dir=CACHE_DIR):
+    """True if the stage's outputs were made with this key and have not changed since."""
+    try:
+        with open(_record_path(stage.name, cache_dir)) as f:
+            record = json.load(f)
+        return record['key'] == key and record['outputs'] == _output_stats(stage)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def save_record(stage, key, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = _record_path(stage.name, cache_dir) + '.part'
+    with open(tmp_path, 'w') as f:
+        json.dump({'key': key, 'outputs': _output_stats(stage)}, f, indent=1)
+    os.replace(tmp_path, _record_path(stage.name, cache_dir))
+
+
+def upstream(stages, targets):
+    """The stages needed for targets (stage names), in pipeline order."""
+    producers = {output: stage for stage in stages for output in stage.outputs}
+    by_name = {stage.name: stage for stage in stages}
+    needed, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in by_name:
+            raise ValueError(f"unknown stage {name}")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(producers[path].name for path in by_name[name].inputs if path in producers)
+    return [stage for stage in stages if stage.name in needed]
+
+
+def _run_stage(stage):
+    t0 = time.perf_counter()
+    stage.run()
+    return time.perf_counter() - t0
+
+
+def run_stages(stages, targets=None, force=(), jobs=None, cache_dir=CACHE_DIR):
+    """
+    Runs the stages (listed in pipeline order) needed for targets, default all, skipping those
+    whose outputs are cached under their current key; force names stages to re-run regardless
+    ('all' for every stage). A stage is keyed once the stages it reads from are done.
+    Stages whose inputs are ready run side by side in up to jobs processes; a stage that is
+    the only one ready runs in this process, so it can start its own worker pool.
+    Returns the names of the stages that ran.
+    """
+    stages = upstream(stages, targets) if targets else list(stages)
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    deps = {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+    for stage in stages:
+        if any(stages.index(s) > stages.index(stage) for s in stages if s.name in deps[stage.name]):
+            raise ValueError(f"stage {stage.name} is listed before a stage it reads from")
+    by_name = {stage.name: stage for stage in stages}
+
+    pending = list(stages)
+    keys = {}
+    ran = []
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            busy = {s.name for s in pending} | set(running.values())
+            ready = [s for s in pending if not deps[s.name] & busy]
+            to_run = []
+            for stage in ready:
+                pending.remove(stage)
+                keys[stage.name] = stage_key(stage, producers)
+                if stage.name not in force and 'all' not in force and is_cached(stage, keys[stage.name], cache_dir):
+                    print(f"[{stage.name}] cached")
+                else:
+                    to_run.append(stage)
+            if not to_run and not running:
+                continue
+            if len(to_run) == 1 and not running:
+                print(f"[{to_run[0].name}] running")
+                done = [(to_run[0], _run_stage(to_run[0]))]
+            else:
+                for stage in to_run:
+                    print(f"[{stage.name}] running")
+                    running[pool.submit(_run_stage, stage)] = stage.name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                done = [(by_name[running.pop(future)], future.result()) for future in finished]
+            for stage, elapsed in done:
+                save_record(stage, keys[stage.name], cache_dir)
+                ran.append(stage.name)
+                print(f"[{stage.name}] done in {elapsed:.1f}s")
+    return ran
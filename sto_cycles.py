@@ -0,0 +1,133 @@
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from log_time import NAT
+from table_access_time import read_cycle_table, cycle_times
+
+# access_location of an STO row (2-sas-sto.py, 4-post-processing.py) -> Location of the cycle table
+STO_LOCATION_PATTERNS = (
+    (re.compile(r'zone:(?P<zone>\d+);cell:(?P<cell>\d+);driveway:(?P<driveway>\d+)'), "Driveway {driveway}, Zone {zone}, Cell {cell}"),
+    (re.compile(r'zone:(?P<zone>\d+);aisle:(?P<aisle>\d+)'), "Aisle {aisle}, Zone {zone}"),
+    (re.compile(r'lvl:(?P<level>\d+)'), "Level {level}"),
+)
+
+# Attached-STO columns added by attach_cycles; Cycle is the cycle table row, -1 when there is none
+CYCLE_COLUMNS = ['Location', 'Cycle', 'Cycle Start']
+
+
+def cycle_location(access_location):
+    """Cycle table Location of an STO access_location, e.g. 'zone:2;aisle:1' -> 'Aisle 1, Zone 2'; None if unknown."""
+    for pattern, location in STO_LOCATION_PATTERNS:
+        m = pattern.fullmatch(str(access_location).strip())
+        if m:
+            return location.format(**m.groupdict())
+    return None
+
+
+def read_stos(stos):
+    """
+    STO rows as 4-post-processing.py writes them (sto_reasons_<date>.csv, a --batch table, or the
+    frame clean_raw_data returns): a frame, a CSV path or a list of CSV paths.
+    """
+    if isinstance(stos, pd.DataFrame):
+        return stos
+    if isinstance(stos, str):
+        stos = [stos]
+    return pd.concat([pd.read_csv(path) for path in stos], ignore_index=True)
+
+
+def sto_times(stos):
+    """
+    UTC epoch ns of each STO's event: its gate closure, or the STO time itself for the records
+    without one (UNLOCALIZED, invalid area); NAT if neither is known.
+    """
+    gate = pd.to_datetime(stos['gate_close_UTC'])
+    sto = pd.to_datetime(stos['sto_time_UTC'])
+    times = gate.fillna(sto).to_numpy(dtype='M8[ns]').view(np.int64).copy()
+    return times
+
+
+def attach_cycles(stos, transitions):
+    """
+    stos with CYCLE_COLUMNS: the cycle of the same location containing each STO's event, a cycle
+    running from its Cycle Start up to the next one at its location (the window build_cycle_table
+    uses; the last one is open). One as-of join of the time-sorted STOs against the time-sorted
+    cycle starts, by location, instead of a scan of the cycles per STO.
+    """
+    stos = read_stos(stos).reset_index(drop=True)
+    cycles = read_cycle_table(transitions)
+    start_ns = cycle_times(cycles, ['Cycle Start'])['Cycle Start'][0]
+
+    # worked out once per distinct access_location
+    codes, uniques = pd.factorize(stos['access_location'].astype(str))
+    locations = np.array([cycle_location(u) for u in uniques], dtype=object)[codes]
+    times = sto_times(stos)
+
+    left = pd.DataFrame({'Location': locations, 'time': times, 'row': np.arange(len(stos))})
+    left = left[pd.notna(left['Location']) & (left['time'] != NAT)].sort_values('time', kind='stable')
+    right = pd.DataFrame({'Location': cycles['Location'].astype(str).to_numpy(), 'time': start_ns,
+                          'cycle': np.arange(len(cycles))})
+    right = right[right['time'] != NAT].sort_values('time', kind='stable')
+    # last cycle start at or before the event, among the starts of the STO's location
+    merged = pd.merge_asof(left, right, on='time', by='Location', direction='backward')
+
+    cycle = np.full(len(stos), -1, dtype=np.int64)
+    cycle[merged['row'].to_numpy()] = merged['cycle'].fillna(-1).to_numpy(dtype=np.int64)
+    attached = stos.copy()
+    attached['Location'] = locations
+    attached['Cycle'] = cycle
+    attached['Cycle Start'] = pd.Series(cycles['Cycle Start'].to_numpy(), dtype=object).reindex(cycle).to_numpy()
+    return attached
+
+
+def cycle_disables(attached, transitions):
+    """
+    One row per cycle (Location, Cycle Start): its STO records, distinct disabled bots, bots
+    disabled by SRE (when the STOs have that flag) and one count column per sto_reason.
+    """
+    cycles = read_cycle_table(transitions)
+    n = len(cycles)
+    hit = attached[attached['Cycle'] >= 0]
+    cycle = hit['Cycle'].to_numpy()
+
+    output_df = cycles[['Location', 'Cycle Start']].reset_index(drop=True)
+    output_df['STO Records'] = np.bincount(cycle, minlength=n)
+    output_df['Disabled Bots'] = np.bincount(hit.drop_duplicates(['Cycle', 'botid'])['Cycle'].to_numpy(), minlength=n)
+    if 'disabled_by_sre' in hit.columns:
+        by_sre = hit[hit['disabled_by_sre'].to_numpy(dtype=bool)].drop_duplicates(['Cycle', 'botid'])
+        output_df['Disabled by SRE'] = np.bincount(by_sre['Cycle'].to_numpy(), minlength=n)
+    reasons = pd.crosstab(cycle, hit['sto_reason'].astype(str).to_numpy())
+    return output_df.join(reasons.reindex(range(n), fill_value=0).astype(np.int64))
+
+
+def correlate_stos(transitions, stos, output_csv='sto_cycles.csv', attached_csv=None):
+    """
+    Writes the per-cycle disables (cycle_disables) of a cycle table (path or frame) and STO
+    rows to output_csv and returns its path; attached_csv also gets every STO with its cycle.
+    With output_csv=None nothing is written and (per-cycle table, attached STOs) is returned.
+    """
+    cycles = read_cycle_table(transitions)
+    attached = attach_cycles(stos, cycles)
+    per_cycle = cycle_disables(attached, cycles)
+    if attached_csv:
+        attached.to_csv(attached_csv, index=False)
+    if output_csv is None:
+        return per_cycle, attached
+    per_cycle.to_csv(output_csv, index=False)
+    unmatched = int((attached['Cycle'] < 0).sum())
+    print(f"{len(attached) - unmatched} of {len(attached)} STOs in {int((per_cycle['STO Records'] > 0).sum())} "
+          f"cycles; results written to {output_csv}")
+    return output_csv
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Attach STO records to the access cycles they occurred in.")
+    arg_parser.add_argument('transitions', help="cycle table (parsed_transitions.csv)")
+    arg_parser.add_argument('stos', nargs='+', help="STO tables of 4-post-processing.py (sto_reasons_<date>.csv)")
+    arg_parser.add_argument('--output', default='sto_cycles.csv')
+    arg_parser.add_argument('--attached', help="also write every STO with its cycle here")
+    args = arg_parser.parse_args()
+    correlate_stos(args.transitions, args.stos, args.output, args.attached)
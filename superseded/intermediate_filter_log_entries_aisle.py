@@ -1,7 +1,12 @@
 # Step 1: Filter raw log to only relevant Z1-Z3 aisle req/key entries
 
 import csv
+import os
 import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from log_filter import KeywordMatcher
 
 # log_file = 'scpu.log'
 log_file = 'scpu-20250710.log'
@@ -25,14 +30,12 @@ exclude_phrases = [
     "Unsafe cell"
 ]
 
-include_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in include_keywords) + r')\b', re.IGNORECASE)
-exclude_pattern = re.compile(r'|'.join(re.escape(p) for p in exclude_phrases), re.IGNORECASE)
+matcher = KeywordMatcher(include_keywords, exclude_phrases)
 
 filtered_lines = []
 with open(log_file, 'r') as f:
     for line in f:
-        line_lower = line.lower()
-        if include_pattern.search(line) and not exclude_pattern.search(line_lower):
+        if matcher.match(line):
             # Clean the hostname: botguardianX.mservices.xxx06020-c.sxxxxxxx → botguardianX
             cleaned_line = re.sub(r'\b(botguardian\d+)\.mservices\..*?\b', r'\1', line.strip())
             filtered_lines.append([cleaned_line])
@@ -1,52 +1,156 @@
+import numpy as np
 import pandas as pd
 
-def compute_transition_deltas(transitions_csv, output_csv='transition_deltas.csv'):
-    df = pd.read_csv(transitions_csv, parse_dates=True)
-
-    # Parse all columns that look like datetimes
-    for col in df.columns:
-        if col not in ['Location']:
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
-
-    output_rows = []
-    for idx, row in df.iterrows():
-        location = row['Location']
-        if location.startswith("Level"):
-            t_request = row.get('Cycle Start', None)  # Start from Cycle Start for Level
-            t_localized_bots = row.get('CLOSED to PREPARING', None)
-            t_safe_access = row.get('PREPARING to SAFE_ACCESS_GRANTED', None)
-
-            delta_closed = None if pd.notnull(t_request) else None
-            delta_localized_bots = (t_localized_bots - t_request).total_seconds() if pd.notnull(t_localized_bots) and pd.notnull(t_request) else None
-            delta_safe_access = (t_safe_access - t_request).total_seconds() if pd.notnull(t_safe_access) and pd.notnull(t_request) else None
-            delta_access_empty = None  # not meaningful for Level
+from log_time import parse_timestamps, local_datetime64, NAT, NS_PER_SECOND
+from reshape_list_to_table import offset_column, time_columns
+
+LOCATION_TYPES = ('Driveway', 'Aisle', 'Level')
+
+REQUEST_START_COLUMN = 'Request Start (YYYY-MM-DD HH:MM)'
+
+# Delta column -> (transition timed from Cycle Start, location types it is reported for)
+DELTA_COLUMNS = {
+    'Time from Request to Gate Closed (s)': ('REQUESTED to CLOSED', ('Driveway', 'Aisle')),
+    'Time from Request to Localizatoin Complete (s)': ('CLOSED to PREPARING', LOCATION_TYPES),
+    'Time from Request to Safe Access Granted (s)': ('PREPARING to SAFE_ACCESS_GRANTED', LOCATION_TYPES),
+    'Time from Request to Access Granted via "empty button" (s)': ('CLOSED_EMPTY to ACCESS_GRANTED_EMPTY',
+                                                                  ('Driveway', 'Aisle')),
+}
+
+
+def location_type(location):
+    """'Driveway', 'Aisle' or 'Level' for a location such as "Aisle 1, Zone 1"."""
+    return location.split(' ', 1)[0]
+
+
+def location_type_masks(locations):
+    """Boolean row mask per location type; the type is worked out once per distinct location."""
+    codes, uniques = pd.factorize(pd.Series(locations), use_na_sentinel=False)
+    types = np.array([location_type(str(u)) for u in uniques], dtype=object)[codes]
+    return {t: types == t for t in LOCATION_TYPES}
+
+
+def read_cycle_table(transitions):
+    """A parsed_transitions table: transitions is its CSV path, or a (text or typed) cycle table already in memory."""
+    if isinstance(transitions, pd.DataFrame):
+        return transitions
+    return pd.read_csv(transitions, dtype=str)
+
+
+def _column_times(df, col):
+    if offset_column(col) in df.columns:  # typed cycle table: nothing to parse
+        return df[col].to_numpy(dtype='M8[ns]').view(np.int64), df[offset_column(col)].to_numpy(dtype=np.int16)
+    return parse_timestamps(df[col])
+
+
+def cycle_times(df, columns=None):
+    """
+    Parses the timestamp columns of a parsed_transitions table (one row per cycle), all of
+    them or just columns, in one vectorized pass each; typed cycle tables are read as they are.
+    Returns {column: (UTC epoch ns, offset minutes)}; a column the table does not have comes back all missing.
+    """
+    if columns is None:
+        columns = time_columns(df)
+    missing = (np.full(len(df), NAT, dtype=np.int64), np.zeros(len(df), dtype=np.int16))
+    return {col: _column_times(df, col) if col in df.columns else missing for col in columns}
+
+
+def seconds_between(start_ns, end_ns):
+    """Vectorized end - start in seconds, NaN where either side is missing."""
+    seconds = (end_ns - start_ns) / NS_PER_SECOND
+    seconds[(start_ns == NAT) | (end_ns == NAT)] = np.nan
+    return seconds
+
 
+def request_start_text(ns, offset):
+    """Cycle start as local 'YYYY-MM-DD HH:MM', None where missing."""
+    text = np.datetime_as_string(local_datetime64(ns, offset), unit='m')
+    text = np.char.replace(text, 'T', ' ').astype(object)
+    text[ns == NAT] = None
+    return text
+
+
+def transition_deltas(df):
+    """
+    The transition_delta_row columns for every cycle at once: each delta is one column
+    subtraction, and location types outside a column's types are masked out.
+    """
+    times = cycle_times(df, ['Cycle Start'] + [transition for transition, _ in DELTA_COLUMNS.values()])
+    start_ns, start_offset = times['Cycle Start']
+    masks = location_type_masks(df['Location'])
+
+    output_df = pd.DataFrame({'Location': df['Location'].to_numpy(),
+                              REQUEST_START_COLUMN: request_start_text(start_ns, start_offset)})
+    for column, (transition, types) in DELTA_COLUMNS.items():
+        seconds = seconds_between(start_ns, times[transition][0])
+        seconds[~np.logical_or.reduce([masks[t] for t in types])] = np.nan
+        output_df[column] = seconds
+    return output_df
+
+
+def latency_matrix(df, pairs=(), transitions_by_type=None):
+    """
+    Full latency table: seconds from Cycle Start to every transition column of a
+    parsed_transitions table ("Cycle Start -> X (s)"), plus seconds between each chosen
+    (from, to) transition pair ("A -> B (s)"), for all cycles in one vectorized pass.
+    transitions_by_type optionally maps a location type to the transitions reported for it;
+    for rows of that type every other column is left empty.
+    """
+    transitions = [col for col in time_columns(df) if col != 'Cycle Start']
+    spans = [('Cycle Start', t) for t in transitions] + list(pairs)
+    times = cycle_times(df, list(dict.fromkeys(['Cycle Start'] + [t for span in spans for t in span])))
+    start_ns, start_offset = times['Cycle Start']
+    masks = location_type_masks(df['Location'])
+
+    output_df = pd.DataFrame({'Location': df['Location'].to_numpy(),
+                              REQUEST_START_COLUMN: request_start_text(start_ns, start_offset)})
+    for a, b in spans:
+        seconds = seconds_between(times[a][0], times[b][0])
+        for t, reported in (transitions_by_type or {}).items():
+            if (a != 'Cycle Start' and a not in reported) or b not in reported:
+                seconds[masks[t]] = np.nan
+        output_df[f"{a} -> {b} (s)"] = seconds
+    return output_df
+
+
+def transition_delta_row(row):
+    """
+    Delta columns for one access cycle; row maps 'Location', 'Cycle Start' and
+    transition names to aware datetimes (a live cycle record of follow_access_cycles),
+    so deltas are exact across offset changes and the request start is shown in local time.
+    Same columns as transition_deltas, which does this for a whole table at once.
+    """
+    location = row['Location']
+    t_request = row.get('Cycle Start', None)
+    request_start_short = pd.to_datetime(t_request).strftime('%Y-%m-%d %H:%M') if pd.notnull(t_request) else None
+
+    output_row = {'Location': location, REQUEST_START_COLUMN: request_start_short}
+    for column, (transition, types) in DELTA_COLUMNS.items():
+        t = row.get(transition, None)
+        if location_type(location) in types and pd.notnull(t) and pd.notnull(t_request):
+            output_row[column] = (t - t_request).total_seconds()
         else:
-            t_request = row.get('Cycle Start', None)  # Use Cycle Start for Driveway/Aisle for consistency
-            t_closed = row.get('REQUESTED to CLOSED', None)
-            t_access_empty = row.get('CLOSED_EMPTY to ACCESS_GRANTED_EMPTY', None)
-            t_localized_bots = row.get('CLOSED to PREPARING', None)
-            t_safe_access = row.get('PREPARING to SAFE_ACCESS_GRANTED', None)
-
-            delta_closed = (t_closed - t_request).total_seconds() if pd.notnull(t_closed) and pd.notnull(t_request) else None
-            delta_access_empty = (t_access_empty - t_request).total_seconds() if pd.notnull(t_access_empty) and pd.notnull(t_request) else None
-            delta_localized_bots = (t_localized_bots - t_request).total_seconds() if pd.notnull(t_localized_bots) and pd.notnull(t_request) else None
-            delta_safe_access = (t_safe_access - t_request).total_seconds() if pd.notnull(t_safe_access) and pd.notnull(t_request) else None
-
-        request_start_short = pd.to_datetime(t_request).strftime('%Y-%m-%d %H:%M') if pd.notnull(t_request) else None
-
-        output_rows.append({
-            'Location': location,
-            'Request Start (YYYY-MM-DD HH:MM)': request_start_short,
-            'Time from Request to Gate Closed (s)': delta_closed,
-            'Time from Request to Localizatoin Complete (s)': delta_localized_bots,
-            'Time from Request to Safe Access Granted (s)': delta_safe_access,
-            'Time from Request to Access Granted via "empty button" (s)': delta_access_empty
-        })
-
-    output_df = pd.DataFrame(output_rows)
+            output_row[column] = None
+    return output_row
+
+
+def compute_transition_deltas(transitions_csv, output_csv='transition_deltas.csv'):
+    """
+    transitions_csv may also be a cycle table DataFrame; with output_csv=None the deltas
+    DataFrame is returned instead of being written.
+    """
+    output_df = transition_deltas(read_cycle_table(transitions_csv))
+    if output_csv is None:
+        return output_df
+    output_df.to_csv(output_csv, index=False)
+    return output_csv
+
+
+def compute_latency_matrix(transitions_csv, output_csv='transition_latency_matrix.csv', pairs=(),
+                           transitions_by_type=None):
+    """Same inputs and outputs as compute_transition_deltas."""
+    output_df = latency_matrix(read_cycle_table(transitions_csv), pairs, transitions_by_type)
+    if output_csv is None:
+        return output_df
     output_df.to_csv(output_csv, index=False)
     return output_csv
@@ -0,0 +1,25 @@
+import os
+
+from sasAccessTimeDataExtraction import extract_and_filter_logs
+
+LINE = ("2025-07-09T03:00:{:02d}.413-04:00 botguardian2.mservices.wmt06020-c.symbotic <info> mast  1 #6009 "
+        "LockedSetSafeAccessState: Aisle 2, Zone 1 transitioned from OPEN to REQUESTED\n")
+
+
+def test_rotated_small_log_is_not_read_again(tmp_path):
+    log = tmp_path / 'scpu.log'
+    filtered_csv = str(tmp_path / 'filtered.csv')
+    log.write_text(LINE.format(0) + LINE.format(1))  # well under the 4 KiB fingerprint
+    extract_and_filter_logs([str(log)], filtered_csv, incremental=True)
+
+    # scpu.log rotated to scpu-20250709.log and grown, a new scpu.log started
+    rotated = tmp_path / 'scpu-20250709.log'
+    os.replace(log, rotated)
+    with open(rotated, 'a') as f:
+        f.write(LINE.format(2))
+    log.write_text(LINE.format(3))
+    extract_and_filter_logs([str(rotated), str(log)], filtered_csv, incremental=True)
+
+    with open(filtered_csv) as f:
+        rows = f.read().splitlines()[1:]
+    assert [row.strip('"')[17:19] for row in rows] == ['00', '01', '02', '03']
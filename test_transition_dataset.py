@@ -0,0 +1,28 @@
+from sasAccessTimeDataExtraction import extract_and_filter_logs
+from transition_dataset import extract_transition_dataset, dataset_partitions
+
+# Day 1 only has driveway transitions, day 2 only aisle transitions
+RAW_LOG = """\
+2025-07-09T03:00:12.413-04:00 botguardian2.mservices.wmt06020-c.symbotic <info> mast  1 #6009 LockedSetSafeAccessState: Driveway 1, Zone 1, Cell 10 transitioned from CLOSED to PREPARING
+2025-07-09T03:00:14.000-04:00 botguardian2.mservices.wmt06020-c.symbotic <info> mast  1 #6009 LockedSetSafeAccessState: Driveway 1, Zone 1, Cell 10 transitioned from PREPARING to OPEN
+2025-07-10T03:00:12.413-04:00 botguardian2.mservices.wmt06020-c.symbotic <info> mast  1 #6009 LockedSetSafeAccessState: Aisle 2, Zone 1 transitioned from OPEN to REQUESTED
+2025-07-10T03:00:14.000-04:00 botguardian3.mservices.wmt06020-c.symbotic <info> mast  1 #6009 LockedSetSafeAccessState: Aisle 2, Zone 1 transitioned from REQUESTED to SAFE_ACCESS_GRANTED
+"""
+
+
+def build(tmp_path, include_keywords):
+    filtered_csv = str(tmp_path / 'filtered.csv')
+    dataset_dir = str(tmp_path / 'transitions')
+    extract_and_filter_logs([str(tmp_path / 'scpu.log')], filtered_csv, include_keywords=include_keywords,
+                            incremental=True)
+    extract_transition_dataset(filtered_csv, dataset_dir, incremental=True)
+    return [(day, host) for day, host, _ in dataset_partitions(dataset_dir)]
+
+
+def test_rebuild_drops_stale_partitions(tmp_path):
+    (tmp_path / 'scpu.log').write_text(RAW_LOG)
+    assert build(tmp_path, ["LockedSetSafeAccessState"]) == [
+        ('2025-07-09', 'botguardian2'), ('2025-07-10', 'botguardian2'), ('2025-07-10', 'botguardian3')]
+    # other keywords: the filtered CSV is rebuilt, and so is the dataset
+    assert build(tmp_path, ["LockedSetSafeAccessState: Driveway"]) == [('2025-07-09', 'botguardian2')]
+    assert not (tmp_path / 'transitions.tmp').exists() and not (tmp_path / 'transitions.old').exists()
@@ -0,0 +1,288 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from log_reader import open_log, is_compressed
+from log_time import parse_timestamps, local_datetime64
+from reshape_list_to_table import LOG_PATTERN, build_cycle_table
+from stage_cache import code_version
+
+try:
+    # Parquet partitions when pyarrow is installed; otherwise the same layout with .npz partitions
+    import pyarrow  # noqa: F401
+    DATASET_FORMAT = 'parquet'
+except ImportError:
+    DATASET_FORMAT = 'npz'
+
+# Host right after the leading timestamp, e.g. botguardian2 (cleaned by the extraction filter)
+HOST_PATTERN = re.compile(r'^"?\S+\s+(\S+)')
+
+# seq is the line's position in the filtered log; it keeps log order among equal timestamps
+DATASET_COLUMNS = ['seq', 'timestamp', 'offset', 'location', 'from_state', 'to_state']
+CATEGORY_COLUMNS = ('location', 'from_state', 'to_state')
+
+# Hive-style partition directories: <dataset>/day=YYYY-MM-DD/host=<host>/part-0.<format>
+PARTITION_COLUMNS = ('day', 'host')
+
+# How far into its filtered log CSV a dataset was built, so the next build only parses what was appended
+SOURCE_STATE = '_source.json'
+
+
+def transition_frame(lines):
+    """
+    Typed frame of the LockedSetSafeAccessState lines among lines: seq, timestamp (int64 UTC
+    epoch ns), offset (int16 minutes), day (site-local date), and host, location, from_state
+    and to_state as categoricals. One vectorized regex pass; other lines are dropped.
+    """
+    lines = pd.Series(lines, dtype=object)
+    m = lines.str.extract(LOG_PATTERN)
+    matched = m['timestamp'].notna().to_numpy()
+    m = m[matched]
+    location = 'Level ' + m['level']
+    location = location.where(m['aisle'].isna(), 'Aisle ' + m['aisle'] + ', Zone ' + m['azone'])
+    location = location.where(m['driveway'].isna(),
+                              'Driveway ' + m['driveway'] + ', Zone ' + m['zone'] + ', Cell ' + m['cell'])
+    ns, offset = parse_timestamps(m['timestamp'])
+    day = local_datetime64(ns, offset).astype('datetime64[D]').astype(str)
+
+    return pd.DataFrame({
+        'seq': np.flatnonzero(matched).astype(np.int64),
+        'timestamp': ns,
+        'offset': offset,
+        'day': pd.Categorical(day),
+        'host': pd.Categorical(lines[matched].str.extract(HOST_PATTERN)[0].to_numpy()),
+        'location': pd.Categorical(location.to_numpy()),
+        'from_state': pd.Categorical(m['from_state'].to_numpy()),
+        'to_state': pd.Categorical(m['to_state'].to_numpy()),
+    })
+
+
+def read_filtered_log(filtered_csv):
+    """transition_frame of a filtered log CSV (header optional)."""
+    with open_log(filtered_csv, 'rt') as f:
+        lines = f.readlines()
+    if lines and lines[0].strip().lower().startswith("log entry"):
+        lines = lines[1:]
+    return transition_frame(lines)
+
+
+def partition_dir(dataset_dir, day, host):
+    return os.path.join(dataset_dir, f"day={day}", f"host={host}")
+
+
+def _write_partition(df, directory, dataset_format):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-0.{dataset_format}")
+    tmp = os.path.join(directory, f"part-0.tmp.{dataset_format}")
+    if dataset_format == 'parquet':
+        df.to_parquet(tmp, index=False)
+    else:
+        arrays = {}
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                arrays[f"{col}.codes"] = df[col].cat.codes.to_numpy()
+                arrays[f"{col}.categories"] = df[col].cat.categories.to_numpy(dtype=str)
+            else:
+                arrays[col] = df[col].to_numpy()
+        with open(tmp, 'wb') as out:
+            np.savez(out, **arrays)
+    # a partition holds one file: replace it, and drop one left in the other format
+    for old in glob.glob(os.path.join(directory, 'part-*')):
+        if old not in (tmp, path):
+            os.remove(old)
+    os.replace(tmp, path)
+
+
+def _partition_file(directory):
+    paths = [path for path in glob.glob(os.path.join(directory, 'part-0.*')) if '.tmp.' not in path]
+    return paths[0] if paths else None
+
+
+def write_transition_dataset(df, dataset_dir, dataset_format=DATASET_FORMAT, append=False):
+    """
+    Writes a transition_frame as one partition per (day, host). The partitions present in df are
+    replaced, any other day already in the dataset is kept, so a day split across two log files
+    should be written from one extraction of both. With append=True the rows of df are added
+    after those already in their partitions instead. Returns the number of partitions written.
+    """
+    count = 0
+    for (day, host), part in df.groupby(list(PARTITION_COLUMNS), observed=True, sort=True):
+        directory = partition_dir(dataset_dir, day, host)
+        part = part[DATASET_COLUMNS].reset_index(drop=True)
+        existing = _partition_file(directory) if append else None
+        if existing:
+            part = pd.concat([_read_partition(existing, DATASET_COLUMNS), part], ignore_index=True)
+            for col in CATEGORY_COLUMNS:
+                part[col] = pd.Categorical(np.asarray(part[col], dtype=object))
+        else:
+            for col in CATEGORY_COLUMNS:
+                part[col] = part[col].cat.remove_unused_categories()
+        _write_partition(part, directory, dataset_format)
+        count += 1
+    return count
+
+
+def _read_partition(path, columns):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    with np.load(path, allow_pickle=False) as arrays:
+        data = {}
+        for col in columns:
+            if f"{col}.codes" in arrays.files:
+                data[col] = pd.Categorical.from_codes(arrays[f"{col}.codes"], arrays[f"{col}.categories"])
+            else:
+                data[col] = arrays[col]
+        return pd.DataFrame(data, columns=columns)
+
+
+def dataset_partitions(dataset_dir, days=None, hosts=None):
+    """[(day, host, path)] of the partitions of a dataset, optionally only the given days/hosts."""
+    partitions = []
+    for path in sorted(glob.glob(os.path.join(dataset_dir, 'day=*', 'host=*', 'part-0.*'))):
+        if '.tmp.' in path:  # left by an interrupted write
+            continue
+        host_dir = os.path.dirname(path)
+        day = os.path.basename(os.path.dirname(host_dir))[len('day='):]
+        host = os.path.basename(host_dir)[len('host='):]
+        if (days is None or day in days) and (hosts is None or host in hosts):
+            partitions.append((day, host, path))
+    return partitions
+
+
+def read_transition_dataset(dataset_dir, columns=None, days=None, hosts=None):
+    """
+    Loads a transition dataset back as a typed frame, reading only the partitions of the given
+    days/hosts and only the given columns (any of DATASET_COLUMNS, 'day' and 'host').
+    Rows come back in time order (log order for equal times); categoricals keep their dictionary encoding.
+    """
+    columns = list(DATASET_COLUMNS if columns is None else columns)
+    stored = [col for col in columns if col not in PARTITION_COLUMNS]
+    frames = []
+    for day, host, path in dataset_partitions(dataset_dir, days, hosts):
+        part = _read_partition(path, list(dict.fromkeys(stored + ['timestamp', 'seq'])))
+        part['day'] = day
+        part['host'] = host
+        frames.append(part)
+    if not frames:
+        empty = {col: pd.Series(dtype='category' if col in CATEGORY_COLUMNS + PARTITION_COLUMNS else np.int64)
+                 for col in columns}
+        return pd.DataFrame(empty, columns=columns)
+
+    df = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS + PARTITION_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.api.types.union_categoricals([pd.Categorical(f[col]) for f in frames])
+    df = df.sort_values(['timestamp', 'seq'], kind='stable').reset_index(drop=True)
+    return df[columns]
+
+
+def _prefix_digest(path, length, block_size=1024 * 1024):
+    """SHA-1 of the first length bytes of a file."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while length > 0:
+            block = f.read(min(block_size, length))
+            if not block:
+                break
+            digest.update(block)
+            length -= len(block)
+    return digest.hexdigest()
+
+
+def _load_source_state(dataset_dir, filtered_csv, code, dataset_format):
+    """
+    The SOURCE_STATE of a dataset if it can be extended from filtered_csv: same code and format,
+    and the CSV still starts with the bytes that were read (it was appended to, not rebuilt).
+    """
+    try:
+        with open(os.path.join(dataset_dir, SOURCE_STATE)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (state.get('code') != code or state.get('format') != dataset_format or is_compressed(filtered_csv)
+            or os.path.getsize(filtered_csv) < state['offset']
+            or _prefix_digest(filtered_csv, state['offset']) != state['digest']):
+        return None
+    return state
+
+
+def _read_lines_from(filtered_csv, offset):
+    """Complete lines of a plain filtered log from byte offset on, and the offset after the last one."""
+    with open(filtered_csv, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    data = data[:data.rfind(b'\n') + 1]
+    # universal newlines, as read_filtered_log reads the file
+    lines = io.StringIO(data.decode('utf-8', errors='ignore'), newline=None).readlines()
+    return lines, offset + len(data)
+
+
+def _swap_in(built_dir, dataset_dir):
+    """Replaces dataset_dir by built_dir (os.replace cannot replace a non-empty directory)."""
+    old_dir = dataset_dir + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(dataset_dir):
+        os.replace(dataset_dir, old_dir)
+    os.replace(built_dir, dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def extract_transition_dataset(filtered_csv, dataset_dir, dataset_format=DATASET_FORMAT, incremental=False):
+    """
+    Parses a filtered log and writes it as a transition dataset. With incremental=True only the
+    lines the CSV gained since the last build are parsed and only the day/host partitions they
+    fall in are rewritten; a CSV that was rebuilt rather than appended to (or a change of this
+    code or of the format) makes it a full build. A full build is written to a temp directory
+    and swapped in, so no partition of an earlier build is left behind.
+    """
+    code = code_version(extract_transition_dataset)
+    state = _load_source_state(dataset_dir, filtered_csv, code, dataset_format) if incremental else None
+    if state:
+        lines, offset = _read_lines_from(filtered_csv, state['offset'])
+        seq_start = state['lines']
+    elif is_compressed(filtered_csv):
+        with open_log(filtered_csv, 'rt') as f:
+            lines = f.readlines()
+        offset = seq_start = 0
+    else:
+        lines, offset = _read_lines_from(filtered_csv, 0)
+        seq_start = 0
+    if not state and lines and lines[0].strip().lower().startswith("log entry"):
+        lines = lines[1:]
+
+    df = transition_frame(lines)
+    df['seq'] += seq_start
+    build_dir = dataset_dir if state else dataset_dir + '.tmp'
+    if not state:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    count = write_transition_dataset(df, build_dir, dataset_format, append=state is not None)
+    os.makedirs(build_dir, exist_ok=True)
+    if not is_compressed(filtered_csv):
+        with open(os.path.join(build_dir, SOURCE_STATE), 'w') as f:
+            json.dump({'offset': offset, 'lines': seq_start + len(lines), 'digest': _prefix_digest(filtered_csv, offset),
+                       'code': code, 'format': dataset_format}, f, indent=1)
+    if not state:
+        _swap_in(build_dir, dataset_dir)
+    print(f"Transition dataset written to {dataset_dir} ({len(df)} {'new ' if state else ''}rows, "
+          f"{count} day/host partitions, {dataset_format})")
+    return dataset_dir
+
+
+def reshape_dataset_to_table(dataset_dir, output_csv='parsed_transitions.csv', days=None):
+    """
+    reshape_log_to_table from a transition dataset: only the needed columns of the given days are
+    read, and put back in log order (seq) so locations come out in the same order.
+    """
+    df = read_transition_dataset(dataset_dir, ['seq', 'location', 'timestamp', 'offset', 'from_state', 'to_state'], days)
+    df = df.sort_values('seq', kind='stable').reset_index(drop=True)
+    df['transition'] = df['from_state'].astype(str) + ' to ' + df['to_state'].astype(str)
+    output_df = build_cycle_table(df)
+    output_df.to_csv(output_csv, index=False)
+    return output_csv
@@ -1,22 +1,107 @@
 import os
 import gzip
-import shutil
+import json
+import zlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 # Set the folder containing .gz files
 folder = r'raw logs'  # Change to your folder name or path if needed
 
-for filename in os.listdir(folder):
-    if filename.endswith('.gz'):
-        gz_path = os.path.join(folder, filename)
-        out_path = os.path.join(folder, filename[:-3])  # Remove .gz extension
-
-        # Only extract if the uncompressed file doesn't already exist
-        if not os.path.exists(out_path):
-            print(f'Extracting {gz_path}...')
-            with gzip.open(gz_path, 'rb') as f_in:
-                with open(out_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-        else:
-            print(f'Skipping {out_path} (already exists)')
-
-print('Done extracting all .gz files.')
+# Decompressed bytes moved per read/write; zlib releases the GIL on buffers this size,
+# so several archives can be expanded at once on a thread pool
+BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def sidecar_path(out_path):
+    # Records which archive an output came from, plus its size and CRC-32
+    return out_path + '.unz.json'
+
+
+def file_crc32(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(BUFFER_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def is_up_to_date(gz_path, out_path, verify=False):
+    """
+    True if out_path is a complete expansion of the current gz_path.
+    A missing sidecar (interrupted run), a changed archive or a size mismatch all mean redo;
+    with verify=True the CRC-32 of the output is recomputed as well.
+    """
+    try:
+        with open(sidecar_path(out_path)) as f:
+            meta = json.load(f)
+        src = os.stat(gz_path)
+        size = os.path.getsize(out_path)
+    except (OSError, ValueError):
+        return False
+    if meta.get('source_size') != src.st_size or meta.get('source_mtime_ns') != src.st_mtime_ns:
+        return False
+    if meta.get('size') != size:
+        return False
+    return not verify or meta.get('crc32') == file_crc32(out_path)
+
+
+def decompress(gz_path, out_path):
+    """
+    Expands gz_path into a temp file next to out_path and renames it into place only once
+    it is complete, so a crash never leaves a truncated file under the final name.
+    gzip checks each member's CRC while reading; the output's own size and CRC-32 go into the sidecar.
+    """
+    src = os.stat(gz_path)
+    out_dir = os.path.dirname(out_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix='.' + os.path.basename(out_path) + '.', suffix='.part')
+    crc = 0
+    size = 0
+    try:
+        with gzip.open(gz_path, 'rb') as f_in, os.fdopen(fd, 'wb') as f_out:
+            while chunk := f_in.read(BUFFER_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                f_out.write(chunk)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates the file private to the owner
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    meta = {'source': os.path.basename(gz_path), 'source_size': src.st_size,
+            'source_mtime_ns': src.st_mtime_ns, 'size': size, 'crc32': crc}
+    tmp_meta = sidecar_path(out_path) + '.part'
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, sidecar_path(out_path))
+    return size
+
+
+def unzip_folder(folder, workers=None, verify=False):
+    jobs = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith('.gz'):
+            gz_path = os.path.join(folder, filename)
+            out_path = os.path.join(folder, filename[:-3])  # Remove .gz extension
+
+            # Only extract if there is no complete, current uncompressed copy
+            if is_up_to_date(gz_path, out_path, verify):
+                print(f'Skipping {out_path} (already exists)')
+            else:
+                jobs.append((gz_path, out_path))
+
+    def run(job):
+        gz_path, out_path = job
+        print(f'Extracting {gz_path}...')
+        size = decompress(gz_path, out_path)
+        print(f'Extracted {out_path} ({size / 1e6:.1f} MB)')
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(run, jobs))
+
+
+if __name__ == '__main__':
+    unzip_folder(folder)
+    print('Done extracting all .gz files.')